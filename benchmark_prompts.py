@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: per-message prompt and keyword setup overhead
+
+Compares rebuilding prompt templates, chains and keyword tables on every
+message (the previous behaviour) with the precompiled objects in
+src/prompts.py. No API calls are made; only chain construction and keyword
+matching are timed.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
+
+from agent import MessageAnalysis
+from prompts import (
+    ANALYSIS_PROMPT_ID, INDUSTRY_KEYWORDS, ISSUE_KEYWORDS, PROMPTS, RESPONSE_PROMPT_ID,
+    SERVICE_KEYWORDS, URGENCY_KEYWORDS, PromptRegistry
+)
+
+
+MESSAGE = (
+    "Hi, we are a hospital network looking to automate patient intake with a chatbot "
+    "and an analytics dashboard. There is an urgent deadline and our current vendor delayed delivery."
+)
+
+llm = ChatOpenAI(api_key="sk-benchmark", model="gpt-4", temperature=0.7)
+
+
+def per_message_setup():
+    """Previous behaviour: everything is rebuilt for each message"""
+    response_prompt = PromptTemplate(
+        input_variables=["customer_name", "context", "user_message"],
+        template=PROMPTS[RESPONSE_PROMPT_ID].template
+    )
+    analysis_prompt = PromptTemplate(
+        input_variables=["message"],
+        template=PROMPTS[ANALYSIS_PROMPT_ID].template
+    )
+    response_prompt | llm
+    analysis_prompt | llm.with_structured_output(MessageAnalysis, method="function_calling")
+
+    import re  # noqa: F401
+    message_lower = MESSAGE.lower()
+    tables = [
+        {category: matcher.keywords for category, matcher in SERVICE_KEYWORDS.items()},
+        {industry: matcher.keywords for industry, matcher in INDUSTRY_KEYWORDS.items()},
+        {"urgency": list(URGENCY_KEYWORDS.keywords)},
+        {"issue": list(ISSUE_KEYWORDS.keywords)},
+    ]
+    return [
+        name for table in tables for name, keywords in table.items()
+        if any(keyword in message_lower for keyword in keywords)
+    ]
+
+
+registry = PromptRegistry(lambda kind: llm)
+registry.register(RESPONSE_PROMPT_ID)
+registry.register(ANALYSIS_PROMPT_ID, cache_kind="analysis", schema=MessageAnalysis)
+matchers = {**SERVICE_KEYWORDS, **INDUSTRY_KEYWORDS, "urgency": URGENCY_KEYWORDS, "issue": ISSUE_KEYWORDS}
+
+
+def precompiled_setup():
+    """Current behaviour: registry chains and compiled matchers"""
+    registry.chain(RESPONSE_PROMPT_ID)
+    registry.chain(ANALYSIS_PROMPT_ID)
+    message_lower = MESSAGE.lower()
+    return [name for name, matcher in matchers.items() if matcher.matches(message_lower)]
+
+
+def main():
+    """Time both paths and print the per-message cost"""
+    assert per_message_setup() == precompiled_setup()
+    runs = 2000
+    for label, func in (("per-message rebuild", per_message_setup), ("precompiled", precompiled_setup)):
+        best = min(timeit.repeat(func, number=runs, repeat=5)) / runs
+        print(f"{label:>20}: {best * 1e6:8.1f} µs/message")
+
+
+if __name__ == "__main__":
+    main()
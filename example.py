@@ -60,13 +60,10 @@ def main():
     print("🤖 PROCESSING CUSTOMER INTERACTIONS")
     print("="*70 + "\n")
 
-    for customer_id, name, message in interactions:
-        response = agent.process_customer_message(
-            customer_id=customer_id,
-            customer_name=name,
-            message=message
-        )
+    # Messages for the same customer are applied in order; LLM calls are batched
+    responses = agent.process_batch(interactions, max_concurrency=4)
 
+    for (customer_id, name, message), response in zip(interactions, responses):
         print(f"\n{'─'*70}")
         print(f"Customer: {name}")
         print(f"Message: {message}")
@@ -1,20 +1,36 @@
 """
 VANCO AI - Enterprise Client Relationship Agent
 LangGraph workflow for managing enterprise client interactions
-Manages the flow: Input -> MemoryRetrieve -> ProfileBuilder -> LLMResponse -> MemoryStore
+Manages the flow:
+    Input -> (MemoryRetrieve || ProfileBuilder)
+          -> (LLMResponse || MessageAnalysis) -> MemoryStore
 
 Built for Vanco AI - Custom AI Development from Concept to Production
 """
-import json
-from typing import Any, Dict, Optional
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Any, AsyncIterator, Dict, Iterator, List, Literal, Optional, Tuple
 from datetime import datetime
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from memory import LocalMemoryManager, SupermemoryManager
+from memory import LocalMemoryManager, SupermemoryManager, WriteBehindMemoryManager
 from profiles import ProfileBuilder, CustomerProfile
+from context_builder import ContextBuilder
+from sentiment import SentimentEngine
+from llm_cache import LLMResponseCache
+from prompts import (
+    ANALYSIS_PROMPT_ID, INDUSTRY_KEYWORDS, ISSUE_KEYWORDS, RESPONSE_PROMPT_ID,
+    SERVICE_KEYWORDS, URGENCY_KEYWORDS, PromptRegistry
+)
+
+
+def merge_node_timings(left: Dict[str, float], right: Dict[str, float]) -> Dict[str, float]:
+    """Reducer that merges per-node timings written by parallel branches"""
+    return {**(left or {}), **(right or {})}
 
 
 class AgentState(BaseModel):
@@ -25,9 +41,37 @@ class AgentState(BaseModel):
     retrieved_memories: list = []
     customer_profile: Optional[Dict[str, Any]] = None
     profile_summary: str = ""
+    recommendations: list = []
     llm_response: str = ""
     memory_stored: bool = False
     sentiment_analysis: str = "neutral"
+    context_tokens: Dict[str, int] = {}
+    node_timings: Annotated[Dict[str, float], merge_node_timings] = {}
+
+
+class MessageAnalysis(BaseModel):
+    """Business details and sentiment extracted from one customer message"""
+    company_name: Optional[str] = Field(None, description="Company/organization name if mentioned")
+    company_type: Optional[str] = Field(None, description="Type like Hospital, Bank, Retail Store, Factory, etc.")
+    industry: Optional[str] = Field(None, description="Industry vertical like Healthcare, Finance, Retail, Manufacturing, etc.")
+    email: Optional[str] = Field(None, description="Email address if mentioned")
+    phone: Optional[str] = Field(None, description="Phone number if mentioned")
+    meeting_date: Optional[str] = Field(None, description="Meeting date if scheduling discussed (YYYY-MM-DD or as mentioned)")
+    meeting_time: Optional[str] = Field(None, description="Meeting time if mentioned")
+    project_name: Optional[str] = Field(None, description="Specific project name or description if discussed")
+    project_type: Optional[str] = Field(None, description="Type of project like Website, Mobile App, AI System, Chatbot, etc.")
+    project_description: Optional[str] = Field(None, description="Brief description of what they want to build")
+    requirements: List[str] = Field(default_factory=list, description="Specific requirements or features mentioned")
+    budget: Optional[str] = Field(None, description="Budget range if mentioned")
+    timeline: Optional[str] = Field(None, description="Decision or project timeline if mentioned")
+    services_interested: List[str] = Field(
+        default_factory=list,
+        description="Services they seem interested in from: AI & Machine Learning, Full-Stack Development, "
+                    "Computer Vision, NLP, Analytics, Cloud & DevOps, Consulting"
+    )
+    sentiment: Literal["positive", "neutral", "negative"] = Field(
+        "neutral", description="Overall sentiment of the customer message"
+    )
 
 
 class CRMAgent:
@@ -37,57 +81,175 @@ class CRMAgent:
         self,
         openai_api_key: str,
         supermemory_api_key: Optional[str] = None,
-        use_local_memory: bool = True
+        use_local_memory: bool = True,
+        write_behind: bool = False,
+        warm_namespace_cache: bool = False,
+        memory_backend: Optional[str] = None,
+        local_storage_dir: Optional[str] = None,
+        profile_db_path: Optional[str] = None,
+        context_token_budget: int = 800,
+        sentiment_model_path: Optional[str] = None,
+        llm_cache_size: int = 1024,
+        llm_cache_path: Optional[str] = None,
+        cache_responses: bool = False,
+        semantic_cache: bool = False,
+        semantic_cache_threshold: float = 0.9,
+        semantic_cache_per_customer: bool = True
     ):
-        """Initialize CRM Agent"""
+        """Initialize CRM Agent
+
+        memory_backend selects "local", "vector" or "supermemory" explicitly;
+        when omitted, use_local_memory and supermemory_api_key decide.
+        local_storage_dir makes the local backend durable across restarts.
+        profile_db_path stores client profiles in SQLite instead of memory.
+        context_token_budget caps the profile/memory/recommendation context
+        placed in each response prompt.
+        Sentiment is classified locally (lexicon, then the optional hashed
+        n-gram model at sentiment_model_path) and only falls back to the LLM
+        when neither tier is confident.
+        Message analysis calls are served from an LLM cache (llm_cache_size
+        LRU entries, optionally persisted to SQLite at llm_cache_path; 0
+        disables it). Creative responses are only cached with cache_responses=True.
+        semantic_cache=True reuses answers to near-duplicate messages (cosine
+        similarity >= semantic_cache_threshold), scoped per customer and profile
+        version; semantic_cache_per_customer=False shares only answers to turns
+        without per-client context.
+        With write_behind=True, interaction memories are persisted on
+        background threads so replies return without waiting on storage.
+        With warm_namespace_cache=True, existing customer namespaces are
+        listed once at startup so no namespace POST is needed for them.
+        """
         self.openai_api_key = openai_api_key
         self.llm = ChatOpenAI(api_key=openai_api_key, model="gpt-4", temperature=0.7)
 
         # Initialize memory system
-        if use_local_memory or not supermemory_api_key:
-            self.memory_manager = LocalMemoryManager()
-        else:
+        if memory_backend is None:
+            memory_backend = "local" if use_local_memory or not supermemory_api_key else "supermemory"
+
+        if memory_backend == "vector":
+            # Imported lazily so NumPy is only needed when this backend is used
+            from vector_memory import VectorMemoryManager
+            self.memory_manager = VectorMemoryManager()
+        elif memory_backend == "supermemory" and supermemory_api_key:
             self.memory_manager = SupermemoryManager(api_key=supermemory_api_key)
+        else:
+            self.memory_manager = LocalMemoryManager(storage_dir=local_storage_dir)
+
+        if write_behind:
+            self.memory_manager = WriteBehindMemoryManager(self.memory_manager)
+
+        if warm_namespace_cache:
+            self.memory_manager.warm_namespace_cache()
 
         # Initialize profile builder
-        self.profile_builder = ProfileBuilder()
+        if profile_db_path:
+            from profile_store import SQLiteProfileRepository
+            self.profile_builder = ProfileBuilder(SQLiteProfileRepository(profile_db_path))
+        else:
+            self.profile_builder = ProfileBuilder()
+
+        self.context_builder = ContextBuilder(token_budget=context_token_budget)
+        self.sentiment_engine = SentimentEngine(model_path=sentiment_model_path)
+
+        # Content-addressed LLM cache, attached per prompt kind in _llm_for
+        self.llm_cache = (
+            LLMResponseCache(max_entries=llm_cache_size, path=llm_cache_path)
+            if llm_cache_size > 0 else None
+        )
+        self.cache_responses = cache_responses
+        self._cached_llms: Dict[str, Tuple[Any, Any]] = {}
+
+        # Per-customer memory change stamps (see memory_version)
+        self._memory_versions: Dict[str, int] = {}
+        self._memory_stamps = itertools.count(1)
+
+        # Templates are parsed once; chains are built on first use per model
+        self.prompts = PromptRegistry(self._llm_for)
+        self.prompts.register(RESPONSE_PROMPT_ID, cache_kind="response" if cache_responses else None)
+        self.prompts.register(ANALYSIS_PROMPT_ID, cache_kind="analysis", schema=MessageAnalysis)
+
+        self.semantic_cache = None
+        if semantic_cache:
+            # Imported lazily so NumPy is only needed when the cache is enabled
+            from semantic_cache import SemanticResponseCache
+            self.semantic_cache = SemanticResponseCache(
+                threshold=semantic_cache_threshold,
+                per_customer=semantic_cache_per_customer
+            )
 
         # Build the graph
         self.graph = self._build_graph()
 
     def _build_graph(self):
-        """Build the LangGraph workflow"""
+        """Build the LangGraph workflow
+
+        Independent steps fan out and join again so their LLM calls overlap:
+        memory retrieval and the profile snapshot run side by side, then the
+        response and the combined extraction/sentiment call run in one
+        superstep before memory storage fans them back in. Every node returns only the
+        keys it writes, so parallel branches never collide on a state key.
+
+        I/O-bound nodes carry a sync and an async implementation, so the same
+        compiled graph serves both graph.invoke and graph.ainvoke.
+        """
         workflow = StateGraph(AgentState)
 
         # Add nodes
-        workflow.add_node("input_node", self._input_node)
-        workflow.add_node("memory_retrieve_node", self._memory_retrieve_node)
+        workflow.add_node("input_node", RunnableLambda(self._input_node, afunc=self._ainput_node))
+        workflow.add_node(
+            "memory_retrieve_node",
+            RunnableLambda(self._memory_retrieve_node, afunc=self._amemory_retrieve_node)
+        )
         workflow.add_node("profile_builder_node", self._profile_builder_node)
-        workflow.add_node("llm_response_node", self._llm_response_node)
-        workflow.add_node("sentiment_analysis_node", self._sentiment_analysis_node)
-        workflow.add_node("memory_store_node", self._memory_store_node)
+        workflow.add_node(
+            "message_analysis_node",
+            RunnableLambda(self._message_analysis_node, afunc=self._amessage_analysis_node)
+        )
+        workflow.add_node(
+            "llm_response_node",
+            RunnableLambda(self._llm_response_node, afunc=self._allm_response_node)
+        )
+        workflow.add_node(
+            "memory_store_node",
+            RunnableLambda(self._memory_store_node, afunc=self._amemory_store_node)
+        )
 
         # Add edges
         workflow.add_edge(START, "input_node")
+
+        # Fan out: retrieval and profile snapshot are independent
         workflow.add_edge("input_node", "memory_retrieve_node")
-        workflow.add_edge("memory_retrieve_node", "profile_builder_node")
-        workflow.add_edge("profile_builder_node", "llm_response_node")
-        workflow.add_edge("llm_response_node", "sentiment_analysis_node")
-        workflow.add_edge("sentiment_analysis_node", "memory_store_node")
+        workflow.add_edge("input_node", "profile_builder_node")
+
+        # Response needs both memories and the profile snapshot
+        workflow.add_edge(["memory_retrieve_node", "profile_builder_node"], "llm_response_node")
+
+        # Extraction and sentiment only need the message and an existing profile
+        workflow.add_edge("profile_builder_node", "message_analysis_node")
+
+        # Fan in: store once the reply and the message analysis are both done
+        workflow.add_edge(["llm_response_node", "message_analysis_node"], "memory_store_node")
         workflow.add_edge("memory_store_node", END)
 
         return workflow.compile()
 
-    def _input_node(self, state: AgentState) -> AgentState:
+    def _input_node(self, state: AgentState) -> Dict[str, Any]:
         """Process input message"""
         print(f"[INPUT] Customer {state.customer_id}: {state.user_message}")
-        # Ensure namespace exists
+        # Ensure namespace exists (memory managers cache this per customer)
         self.memory_manager.create_memory_namespace(state.customer_id)
-        return state
+        return {}
 
-    def _memory_retrieve_node(self, state: AgentState) -> AgentState:
+    async def _ainput_node(self, state: AgentState) -> Dict[str, Any]:
+        """Async variant of _input_node"""
+        print(f"[INPUT] Customer {state.customer_id}: {state.user_message}")
+        await self.memory_manager.acreate_memory_namespace(state.customer_id)
+        return {}
+
+    def _memory_retrieve_node(self, state: AgentState) -> Dict[str, Any]:
         """Retrieve relevant memories from customer history"""
         print(f"[MEMORY RETRIEVE] Fetching memories for customer {state.customer_id}")
+        started = time.perf_counter()
 
         # Retrieve relevant memories
         memories = self.memory_manager.retrieve_memories(
@@ -96,135 +258,239 @@ class CRMAgent:
             limit=5
         )
 
-        state.retrieved_memories = memories
         print(f"[MEMORY RETRIEVE] Found {len(memories)} relevant memories")
-        return state
+        return {
+            "retrieved_memories": memories,
+            "node_timings": {"memory_retrieve_node": time.perf_counter() - started}
+        }
+
+    async def _amemory_retrieve_node(self, state: AgentState) -> Dict[str, Any]:
+        """Async variant of _memory_retrieve_node"""
+        print(f"[MEMORY RETRIEVE] Fetching memories for customer {state.customer_id}")
+        started = time.perf_counter()
+
+        memories = await self.memory_manager.aretrieve_memories(
+            customer_id=state.customer_id,
+            query=state.user_message,
+            limit=5
+        )
+
+        print(f"[MEMORY RETRIEVE] Found {len(memories)} relevant memories")
+        return {
+            "retrieved_memories": memories,
+            "node_timings": {"memory_retrieve_node": time.perf_counter() - started}
+        }
 
-    def _profile_builder_node(self, state: AgentState) -> AgentState:
-        """Build or update customer profile"""
+    def _profile_builder_node(self, state: AgentState) -> Dict[str, Any]:
+        """Load or create the customer profile and snapshot it for the response"""
         print(f"[PROFILE BUILDER] Building profile for customer {state.customer_id}")
 
         # Get or create profile
-        profile = self.profile_builder.get_profile(state.customer_id)
-        if not profile:
-            profile = self.profile_builder.create_profile(
-                customer_id=state.customer_id,
-                name=state.customer_name
-            )
+        self.profile_builder.get_or_create_profile(state.customer_id, state.customer_name)
+
+        # Snapshot before extraction runs so the response context is deterministic
+        print("[PROFILE BUILDER] Profile loaded successfully")
+        return {
+            "profile_summary": self.profile_builder.get_profile_summary(state.customer_id),
+            "customer_profile": self.profile_builder.export_profile(state.customer_id),
+            "recommendations": self.profile_builder.recommend_products(state.customer_id)
+        }
+
+    def _message_analysis_node(self, state: AgentState) -> Dict[str, Any]:
+        """Extract business details and sentiment in one structured LLM call"""
+        print(f"[MESSAGE ANALYSIS] Analyzing message for customer {state.customer_id}")
+        started = time.perf_counter()
 
-        # Extract information from message to update profile
-        self._extract_and_update_profile(state.customer_id, state.user_message)
+        try:
+            analysis = self._analysis_chain().invoke({"message": state.user_message})
+        except Exception as e:
+            print(f"[MESSAGE ANALYSIS] Error analyzing message: {e}")
+            analysis = None
+        return self._apply_analysis(state, analysis, started)
 
-        # Get profile summary
-        profile_summary = self.profile_builder.get_profile_summary(state.customer_id)
-        state.profile_summary = profile_summary
-        state.customer_profile = self.profile_builder.export_profile(state.customer_id)
+    async def _amessage_analysis_node(self, state: AgentState) -> Dict[str, Any]:
+        """Async variant of _message_analysis_node"""
+        print(f"[MESSAGE ANALYSIS] Analyzing message for customer {state.customer_id}")
+        started = time.perf_counter()
 
-        print("[PROFILE BUILDER] Profile updated successfully")
-        return state
+        try:
+            analysis = await self._analysis_chain().ainvoke({"message": state.user_message})
+        except Exception as e:
+            print(f"[MESSAGE ANALYSIS] Error analyzing message: {e}")
+            analysis = None
+        return self._apply_analysis(state, analysis, started)
 
-    def _llm_response_node(self, state: AgentState) -> AgentState:
+    def _llm_response_node(self, state: AgentState) -> Dict[str, Any]:
         """Generate personalized response using ChatGPT"""
         print("[LLM RESPONSE] Generating personalized response")
+        started = time.perf_counter()
 
-        # Build context from memories and profile
-        context = self._build_context(state)
-
-        # Create prompt
-        prompt_template = PromptTemplate(
-            input_variables=["customer_name", "context", "user_message"],
-            template="""You are a professional Enterprise Client Relationship Manager at VANCO AI - a leading AI development company that builds custom AI solutions for enterprises.
-
-ABOUT VANCO AI:
-- Custom AI development from concept to production
-- Services: AI & Machine Learning, Full-Stack Product Engineering, Analytics & Data Engineering, Cloud & DevOps
-- Capabilities: Generative AI (LLMs, VLMs), Computer Vision, NLP & Conversational AI, Predictive Analytics
-- Offerings: Full-Stack AI Product Development, Workforce Augmentation, AI Consulting
-- Trusted by 50+ enterprises including Toyota, Mahindra, Tata, and more
-- Global offices in India, USA, UK, Dubai
-
-Client Information:
-{context}
-
-Client Message: {user_message}
-
-Based on the client's history, project interests, and current message, provide a personalized, professional response.
-Remember to:
-1. Address the client by name ({customer_name})
-2. Reference their past projects, interests, or industry when relevant
-3. Suggest relevant Vanco AI services or solutions if appropriate
-4. Show deep understanding of their enterprise AI needs
-5. Provide actionable next steps or schedule consultation if needed
-6. Maintain a consultative, expert tone befitting enterprise clients
-7. Do NOT include any signature, sign-off with a name, or "[Your Name]" placeholder - just provide the response content directly
-8. Keep the response conversational and helpful without formal letter-style endings
-
-Response:"""
-        )
+        # Near-duplicate questions can reuse an earlier answer
+        scope = self._semantic_scope(state)
+        cached = self._semantic_lookup(state, scope)
+        if cached is not None:
+            return self._cached_response(cached, started)
 
         # Generate response
-        chain = prompt_template | self.llm
-        response = chain.invoke({
-            "customer_name": state.customer_name,
-            "context": context,
-            "user_message": state.user_message
-        })
+        inputs, context_tokens = self._response_inputs(state)
+        response = self._response_chain().invoke(inputs)
+        self._semantic_store(state, scope, response.content)
 
-        state.llm_response = response.content
         print("[LLM RESPONSE] Response generated successfully")
-        return state
+        return {
+            "llm_response": response.content,
+            "context_tokens": context_tokens,
+            "node_timings": {"llm_response_node": time.perf_counter() - started}
+        }
 
-    def _sentiment_analysis_node(self, state: AgentState) -> AgentState:
-        """Analyze sentiment of customer message"""
-        print("[SENTIMENT ANALYSIS] Analyzing customer sentiment")
+    async def _allm_response_node(self, state: AgentState) -> Dict[str, Any]:
+        """Async variant of _llm_response_node"""
+        print("[LLM RESPONSE] Generating personalized response")
+        started = time.perf_counter()
 
-        sentiment_prompt = PromptTemplate(
-            input_variables=["message"],
-            template="""Analyze the sentiment of this customer message and respond with only one word: positive, neutral, or negative.
+        scope = self._semantic_scope(state)
+        cached = self._semantic_lookup(state, scope)
+        if cached is not None:
+            return self._cached_response(cached, started)
 
-Message: {message}
+        inputs, context_tokens = self._response_inputs(state)
+        response = await self._response_chain().ainvoke(inputs)
+        self._semantic_store(state, scope, response.content)
 
-Sentiment:"""
+        print("[LLM RESPONSE] Response generated successfully")
+        return {
+            "llm_response": response.content,
+            "context_tokens": context_tokens,
+            "node_timings": {"llm_response_node": time.perf_counter() - started}
+        }
+
+    def _semantic_scope(self, state: AgentState) -> Optional[int]:
+        """Semantic cache scope for a turn, or None when the cache is off"""
+        if self.semantic_cache is None:
+            return None
+        return self.semantic_cache.scope_for(
+            state.customer_id, state.customer_profile, state.retrieved_memories
         )
 
-        chain = sentiment_prompt | self.llm
-        sentiment = chain.invoke({"message": state.user_message})
-        sentiment_text = sentiment.content.strip().lower()
+    def _semantic_lookup(self, state: AgentState, scope: Optional[int]) -> Optional[str]:
+        """Answer cached for a near-duplicate message, if any"""
+        if scope is None:
+            return None
+        return self.semantic_cache.lookup(state.user_message, scope, state.customer_name)
+
+    def _semantic_store(self, state: AgentState, scope: Optional[int], response: str) -> None:
+        """Remember a generated answer for near-duplicate messages"""
+        if scope is not None:
+            self.semantic_cache.store(state.user_message, scope, response, state.customer_name)
+
+    def _cached_response(self, response: str, started: float) -> Dict[str, Any]:
+        """Node output for an answer served from the semantic cache"""
+        print("[LLM RESPONSE] Served from semantic cache")
+        return {
+            "llm_response": response,
+            "context_tokens": {},
+            "node_timings": {"llm_response_node": time.perf_counter() - started}
+        }
 
-        # Validate sentiment
-        if sentiment_text not in ["positive", "neutral", "negative"]:
-            sentiment_text = "neutral"
+    def _response_chain(self):
+        """Personalized response chain"""
+        return self.prompts.chain(RESPONSE_PROMPT_ID)
+
+    def _response_inputs(self, state: AgentState) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """Build the response prompt inputs from state, with context token counts"""
+        context, context_tokens = self._build_context(state)
+        return {
+            "customer_name": state.customer_name,
+            "context": context,
+            "user_message": state.user_message
+        }, context_tokens
+
+    def _analysis_chain(self):
+        """Combined extraction and sentiment chain with a validated schema"""
+        return self.prompts.chain(ANALYSIS_PROMPT_ID)
+
+    def _llm_for(self, kind: Optional[str]):
+        """self.llm with the LLM cache attached for a prompt kind (None or no cache: uncached)"""
+        if kind is None or self.llm_cache is None:
+            return self.llm
+        source, cached = self._cached_llms.get(kind, (None, None))
+        if source is not self.llm:
+            # Shallow copy shares the HTTP client; only the cache differs
+            cached = self.llm.model_copy(update={"cache": self.llm_cache.for_kind(kind)})
+            self._cached_llms[kind] = (self.llm, cached)
+        return cached
+
+    def _apply_analysis(
+        self,
+        state: AgentState,
+        analysis: Optional[MessageAnalysis],
+        started: float
+    ) -> Dict[str, Any]:
+        """Update the profile from a message analysis and settle the sentiment"""
+        if analysis is not None:
+            self._apply_extracted_info(state.customer_id, analysis)
+        self._apply_keyword_signals(state.customer_id, state.user_message)
+
+        # The LLM's label wins; the local tiers only cover a failed analysis call
+        if analysis is not None:
+            sentiment_text, tier = analysis.sentiment, "llm"
+            self.sentiment_engine.record("llm")
+        else:
+            sentiment_text, tier = self.sentiment_engine.classify(state.user_message)
+            if sentiment_text is None:
+                sentiment_text, tier = "neutral", "default"
+                self.sentiment_engine.record(tier)
 
-        state.sentiment_analysis = sentiment_text
         self.profile_builder.update_sentiment(state.customer_id, sentiment_text)
 
-        print(f"[SENTIMENT ANALYSIS] Sentiment: {sentiment_text}")
-        return state
+        print(f"[MESSAGE ANALYSIS] Sentiment: {sentiment_text} ({tier})")
+        return {
+            "sentiment_analysis": sentiment_text,
+            "node_timings": {"message_analysis_node": time.perf_counter() - started}
+        }
 
-    def _memory_store_node(self, state: AgentState) -> AgentState:
+    def _memory_store_node(self, state: AgentState) -> Dict[str, Any]:
         """Store interaction in memory"""
         print("[MEMORY STORE] Storing interaction in memory")
 
-        # Store customer message
-        self.memory_manager.store_memory(
-            customer_id=state.customer_id,
-            content=state.user_message,
-            memory_type="customer_query",
-            metadata={
-                "sentiment": state.sentiment_analysis,
-                "timestamp": datetime.now().isoformat()
-            }
-        )
+        # Query and response go out in one write round-trip
+        self.memory_manager.store_memories(state.customer_id, self._interaction_memories(state))
 
-        # Store agent response
-        self.memory_manager.store_memory(
-            customer_id=state.customer_id,
-            content=state.llm_response,
-            memory_type="agent_response",
-            metadata={
-                "timestamp": datetime.now().isoformat()
+        return self._finish_interaction(state)
+
+    async def _amemory_store_node(self, state: AgentState) -> Dict[str, Any]:
+        """Async variant of _memory_store_node"""
+        print("[MEMORY STORE] Storing interaction in memory")
+
+        await self.memory_manager.astore_memories(state.customer_id, self._interaction_memories(state))
+
+        return self._finish_interaction(state)
+
+    def _interaction_memories(self, state: AgentState) -> List[Dict[str, Any]]:
+        """Build the customer query and agent response memories for a turn"""
+        return [
+            # Customer message
+            {
+                "content": state.user_message,
+                "memory_type": "customer_query",
+                "metadata": {
+                    "sentiment": state.sentiment_analysis,
+                    "timestamp": datetime.now().isoformat()
+                }
+            },
+            # Agent response
+            {
+                "content": state.llm_response,
+                "memory_type": "agent_response",
+                "metadata": {
+                    "timestamp": datetime.now().isoformat()
+                }
             }
-        )
+        ]
+
+    def _finish_interaction(self, state: AgentState) -> Dict[str, Any]:
+        """Update the interaction summary once the turn has been stored"""
+        self._memory_versions[state.customer_id] = next(self._memory_stamps)
 
         # Update interaction summary in profile
         self.profile_builder.update_last_interaction(
@@ -232,171 +498,88 @@ Sentiment:"""
             state.user_message[:100] + "..." if len(state.user_message) > 100 else state.user_message
         )
 
-        state.memory_stored = True
         print("[MEMORY STORE] Interaction stored successfully")
-        return state
-
-    def _build_context(self, state: AgentState) -> str:
-        """Build context from memories and profile"""
-        context = ""
-
-        # Add profile information
-        if state.profile_summary:
-            context += "Profile Summary:\n" + state.profile_summary + "\n\n"
-
-        # Add relevant memories
-        if state.retrieved_memories:
-            context += "Relevant Past Interactions:\n"
-            for memory in state.retrieved_memories[:3]:
-                if isinstance(memory, dict):
-                    content = memory.get("content", str(memory))
-                else:
-                    content = str(memory)
-                context += f"- {content}\n"
-            context += "\n"
-
-        # Add product recommendations
-        recommendations = self.profile_builder.recommend_products(state.customer_id)
-        if recommendations:
-            context += "Suggested Products to Recommend:\n"
-            for rec in recommendations:
-                context += f"- {rec}\n"
-
-        return context or "No previous history available for this customer."
-
-    def _extract_and_update_profile(self, customer_id: str, message: str) -> None:
-        """Extract information from message using AI and update profile"""
-        message_lower = message.lower()
+        return {
+            "memory_stored": True,
+            "customer_profile": self.profile_builder.export_profile(state.customer_id)
+        }
 
-        # Use LLM to extract structured information from the message
-        extraction_prompt = PromptTemplate(
-            input_variables=["message"],
-            template="""Analyze this customer message and extract any relevant business information.
-Return a JSON object with the following fields (use null if not found):
-
-{{
-    "company_name": "extracted company/organization name if mentioned",
-    "company_type": "type like Hospital, Bank, Retail Store, Factory, etc.",
-    "industry": "industry vertical like Healthcare, Finance, Retail, Manufacturing, etc.",
-    "email": "email address if mentioned",
-    "phone": "phone number if mentioned",
-    "meeting_date": "meeting date if scheduling discussed (format: YYYY-MM-DD or as mentioned)",
-    "meeting_time": "meeting time if mentioned",
-    "project_name": "specific project name or description if discussed",
-    "project_type": "type of project like Website, Mobile App, AI System, Chatbot, etc.",
-    "project_description": "brief description of what they want to build",
-    "requirements": ["list of specific requirements or features mentioned"],
-    "budget": "budget range if mentioned",
-    "timeline": "decision or project timeline if mentioned",
-    "services_interested": ["list of services they seem interested in from: AI & Machine Learning, Full-Stack Development, Computer Vision, NLP, Analytics, Cloud & DevOps, Consulting"]
-}}
-
-Customer Message: {message}
-
-JSON Response:"""
+    def _build_context(self, state: AgentState) -> Tuple[str, Dict[str, int]]:
+        """Build the token-budgeted context from profile, memories and recommendations"""
+        context, context_tokens = self.context_builder.build(
+            state.customer_profile,
+            state.retrieved_memories,
+            state.recommendations
         )
+        print(f"[LLM RESPONSE] Context tokens: {context_tokens}")
+        return context, context_tokens
+
+    def _apply_extracted_info(self, customer_id: str, extracted: MessageAnalysis) -> None:
+        """Update the profile from validated extraction fields"""
+        # Update company info
+        if extracted.company_name or extracted.company_type or extracted.industry:
+            self.profile_builder.update_company_info(
+                customer_id,
+                company=extracted.company_name,
+                company_type=extracted.company_type,
+                industry=extracted.industry
+            )
 
-        try:
-            chain = extraction_prompt | self.llm
-            result = chain.invoke({"message": message})
-            
-            # Parse JSON response
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', result.content)
-            if json_match:
-                extracted = json.loads(json_match.group())
-                
-                # Update company info
-                if extracted.get("company_name") or extracted.get("company_type") or extracted.get("industry"):
-                    self.profile_builder.update_company_info(
-                        customer_id,
-                        company=extracted.get("company_name"),
-                        company_type=extracted.get("company_type"),
-                        industry=extracted.get("industry")
-                    )
-                
-                # Update contact info
-                if extracted.get("email") or extracted.get("phone"):
-                    self.profile_builder.update_contact_info(
-                        customer_id,
-                        email=extracted.get("email"),
-                        phone=extracted.get("phone")
-                    )
-                
-                # Add scheduled meeting
-                if extracted.get("meeting_date"):
-                    self.profile_builder.add_scheduled_meeting(
-                        customer_id,
-                        meeting_date=extracted.get("meeting_date", "TBD"),
-                        meeting_time=extracted.get("meeting_time", "TBD"),
-                        purpose="Project Discussion"
-                    )
-                
-                # Add proposed project
-                if extracted.get("project_name") or extracted.get("project_type"):
-                    self.profile_builder.add_proposed_project(
-                        customer_id,
-                        project_name=extracted.get("project_name") or extracted.get("project_type", "New Project"),
-                        project_type=extracted.get("project_type", "AI Solution"),
-                        description=extracted.get("project_description", "To be discussed")
-                    )
-                
-                # Add requirements
-                if extracted.get("requirements"):
-                    for req in extracted.get("requirements", []):
-                        if req:
-                            self.profile_builder.add_key_requirement(customer_id, req)
-                
-                # Update service interests
-                if extracted.get("services_interested"):
-                    self.profile_builder.update_service_interests(
-                        customer_id, 
-                        extracted.get("services_interested", [])
-                    )
+        # Update contact info
+        if extracted.email or extracted.phone:
+            self.profile_builder.update_contact_info(
+                customer_id,
+                email=extracted.email,
+                phone=extracted.phone
+            )
 
-        except Exception as e:
-            print(f"[PROFILE EXTRACTION] Error extracting info: {e}")
+        # Add scheduled meeting
+        if extracted.meeting_date:
+            self.profile_builder.add_scheduled_meeting(
+                customer_id,
+                meeting_date=extracted.meeting_date,
+                meeting_time=extracted.meeting_time or "TBD",
+                purpose="Project Discussion"
+            )
 
-        # Fallback: Simple keyword-based extraction
-        # Detect service interests for Vanco AI
-        service_keywords = {
-            "ai_ml": ["ai", "machine learning", "ml", "deep learning", "neural", "model", "llm", "gpt", "generative"],
-            "computer_vision": ["vision", "image", "video", "detection", "recognition", "ocr", "camera"],
-            "nlp": ["nlp", "chatbot", "conversational", "language", "text", "sentiment", "speech"],
-            "data_analytics": ["analytics", "dashboard", "data", "pipeline", "bi", "reporting", "insights"],
-            "cloud_devops": ["cloud", "aws", "azure", "gcp", "devops", "infrastructure", "deployment"],
-            "full_stack": ["web", "mobile", "app", "api", "frontend", "backend", "development", "website"],
-            "consulting": ["consulting", "strategy", "roadmap", "assessment", "audit"],
-            "automation": ["automation", "workflow", "process", "rpa", "automate"],
-        }
+        # Add proposed project
+        if extracted.project_name or extracted.project_type:
+            self.profile_builder.add_proposed_project(
+                customer_id,
+                project_name=extracted.project_name or extracted.project_type,
+                project_type=extracted.project_type or "AI Solution",
+                description=extracted.project_description or "To be discussed"
+            )
+
+        # Add requirements
+        for req in extracted.requirements:
+            if req:
+                self.profile_builder.add_key_requirement(customer_id, req)
 
-        for category, keywords in service_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
+        # Update service interests
+        if extracted.services_interested:
+            self.profile_builder.update_service_interests(customer_id, extracted.services_interested)
+
+    def _apply_keyword_signals(self, customer_id: str, message: str) -> None:
+        """Fallback: Simple keyword-based extraction"""
+        message_lower = message.lower()
+
+        # Detect service interests for Vanco AI
+        for category, matcher in SERVICE_KEYWORDS.items():
+            if matcher.matches(message_lower):
                 self.profile_builder.update_preferences(customer_id, [category])
 
         # Detect industry
-        industry_keywords = {
-            "manufacturing": ["manufacturing", "factory", "production", "supply chain"],
-            "retail": ["retail", "ecommerce", "store", "shopping"],
-            "healthcare": ["healthcare", "medical", "hospital", "pharma"],
-            "finance": ["finance", "banking", "fintech", "insurance"],
-            "media": ["media", "entertainment", "content", "streaming"],
-            "logistics": ["logistics", "shipping", "delivery", "transport"],
-            "education": ["education", "university", "learning", "training"],
-        }
-
-        for industry, keywords in industry_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
+        for industry, matcher in INDUSTRY_KEYWORDS.items():
+            if matcher.matches(message_lower):
                 self.profile_builder.add_tag(customer_id, f"industry:{industry}")
 
         # Detect project urgency
-        urgency_keywords = ["urgent", "asap", "immediately", "deadline", "quick", "fast"]
-        if any(keyword in message_lower for keyword in urgency_keywords):
+        if URGENCY_KEYWORDS.matches(message_lower):
             self.profile_builder.add_tag(customer_id, "high_priority")
 
         # Detect issues
-        issue_keywords = ["problem", "issue", "bug", "broken", "not working", "complaint", "disappointed", "delayed", "failed"]
-        if any(keyword in message_lower for keyword in issue_keywords):
+        if ISSUE_KEYWORDS.matches(message_lower):
             self.profile_builder.add_issue(
                 customer_id,
                 message[:100],
@@ -429,6 +612,199 @@ JSON Response:"""
             return final_state.get("llm_response", "")
         return final_state.llm_response
 
+    async def aprocess_customer_message(
+        self,
+        customer_id: str,
+        customer_name: str,
+        message: str
+    ) -> str:
+        """Async variant of process_customer_message
+
+        Runs the workflow with graph.ainvoke, so LLM calls use ainvoke and
+        memory operations use the async memory manager methods. Many
+        conversations can then share one event loop instead of one thread each.
+        """
+        print(f"\n{'='*60}")
+        print(f"Processing message from {customer_name} ({customer_id})")
+        print(f"{'='*60}\n")
+
+        initial_state = AgentState(
+            customer_id=customer_id,
+            customer_name=customer_name,
+            user_message=message
+        )
+
+        final_state = await self.graph.ainvoke(initial_state)
+
+        if isinstance(final_state, dict):
+            return final_state.get("llm_response", "")
+        return final_state.llm_response
+
+    def stream_customer_message(
+        self,
+        customer_id: str,
+        customer_name: str,
+        message: str
+    ) -> Iterator[str]:
+        """Process a customer message, yielding response tokens as they arrive
+
+        Runs the same workflow as process_customer_message, streaming only the
+        llm_response_node tokens. The message analysis call runs beside
+        the response as usual; memory storage completes before the iterator
+        is exhausted.
+        """
+        print(f"\n{'='*60}")
+        print(f"Streaming message from {customer_name} ({customer_id})")
+        print(f"{'='*60}\n")
+
+        initial_state = AgentState(
+            customer_id=customer_id,
+            customer_name=customer_name,
+            user_message=message
+        )
+
+        streamed = False
+        for mode, payload in self.graph.stream(initial_state, stream_mode=["messages", "updates"]):
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") == "llm_response_node" and chunk.content:
+                    streamed = True
+                    yield chunk.content
+            elif not streamed and "llm_response_node" in payload:
+                # Served from the semantic cache: no tokens were generated
+                yield payload["llm_response_node"]["llm_response"]
+
+    async def astream_customer_message(
+        self,
+        customer_id: str,
+        customer_name: str,
+        message: str
+    ) -> AsyncIterator[str]:
+        """Async variant of stream_customer_message"""
+        print(f"\n{'='*60}")
+        print(f"Streaming message from {customer_name} ({customer_id})")
+        print(f"{'='*60}\n")
+
+        initial_state = AgentState(
+            customer_id=customer_id,
+            customer_name=customer_name,
+            user_message=message
+        )
+
+        streamed = False
+        async for mode, payload in self.graph.astream(initial_state, stream_mode=["messages", "updates"]):
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") == "llm_response_node" and chunk.content:
+                    streamed = True
+                    yield chunk.content
+            elif not streamed and "llm_response_node" in payload:
+                yield payload["llm_response_node"]["llm_response"]
+
+    def close(self) -> None:
+        """Release pooled connections held by the memory manager, profile store and LLM cache"""
+        self.memory_manager.close()
+        self.profile_builder.close()
+        if self.llm_cache is not None:
+            self.llm_cache.close()
+
+    async def aclose(self) -> None:
+        """Release async resources held by the memory manager"""
+        await self.memory_manager.aclose()
+
+    def process_batch(
+        self,
+        messages: List[Tuple[str, str, str]],
+        max_concurrency: int = 8
+    ) -> List[str]:
+        """Process many (customer_id, customer_name, message) tuples in bulk
+
+        Messages are grouped by customer and processed in waves: wave k holds
+        the k-th message of every customer, so each customer's messages are
+        applied in their original order while different customers share one
+        LLM batch per prompt. Memory reads for a wave are issued concurrently
+        and each turn is written with a single store_memories call. Returns
+        the responses in input order.
+        """
+        queues: Dict[str, List[int]] = {}
+        for index, (customer_id, _, _) in enumerate(messages):
+            queues.setdefault(customer_id, []).append(index)
+
+        responses = [""] * len(messages)
+        wave_count = max((len(queue) for queue in queues.values()), default=0)
+        config = {"max_concurrency": max_concurrency}
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            for wave in range(wave_count):
+                indices = [queue[wave] for queue in queues.values() if wave < len(queue)]
+                print(f"[BATCH] Wave {wave + 1}/{wave_count}: {len(indices)} messages")
+
+                states = [
+                    AgentState(
+                        customer_id=messages[i][0],
+                        customer_name=messages[i][1],
+                        user_message=messages[i][2]
+                    )
+                    for i in indices
+                ]
+                states = list(executor.map(self._prepare_batch_state, states))
+
+                # Near-duplicate messages reuse cached answers; the rest share one LLM batch
+                scopes = [self._semantic_scope(state) for state in states]
+                for state, scope in zip(states, scopes):
+                    state.llm_response = self._semantic_lookup(state, scope) or ""
+                pending = [i for i, state in enumerate(states) if not state.llm_response]
+
+                # One LLM batch per prompt, both running side by side
+                reply_batch = executor.submit(
+                    self._response_chain().batch,
+                    [self._response_inputs(states[i])[0] for i in pending],
+                    config=config,
+                    return_exceptions=True
+                )
+                analysis_batch = executor.submit(
+                    self._analysis_chain().batch,
+                    [{"message": state.user_message} for state in states],
+                    config=config,
+                    return_exceptions=True
+                )
+
+                for i, reply in zip(pending, reply_batch.result()):
+                    state = states[i]
+                    if isinstance(reply, Exception):
+                        print(f"[BATCH] Error generating response for {state.customer_id}: {reply}")
+                    else:
+                        state.llm_response = reply.content
+                        self._semantic_store(state, scopes[i], reply.content)
+
+                for state, analysis in zip(states, analysis_batch.result()):
+                    if isinstance(analysis, Exception):
+                        print(f"[MESSAGE ANALYSIS] Error analyzing message: {analysis}")
+                        analysis = None
+                    state.sentiment_analysis = self._apply_analysis(
+                        state, analysis, time.perf_counter()
+                    )["sentiment_analysis"]
+
+                list(executor.map(self._store_batch_turn, states))
+
+                for index, state in zip(indices, states):
+                    responses[index] = state.llm_response
+
+        return responses
+
+    def _prepare_batch_state(self, state: AgentState) -> AgentState:
+        """Load memories and the profile snapshot for one batched message"""
+        self.memory_manager.create_memory_namespace(state.customer_id)
+        updates = self._memory_retrieve_node(state)
+        updates.update(self._profile_builder_node(state))
+        return state.model_copy(update=updates)
+
+    def _store_batch_turn(self, state: AgentState) -> None:
+        """Store one batched turn, skipping a response that failed to generate"""
+        memories = [memory for memory in self._interaction_memories(state) if memory["content"]]
+        self.memory_manager.store_memories(state.customer_id, memories)
+        self._finish_interaction(state)
+
     def get_customer_profile(self, customer_id: str) -> Optional[Dict[str, Any]]:
         """Get customer profile"""
         return self.profile_builder.export_profile(customer_id)
@@ -440,3 +816,11 @@ JSON Response:"""
     def get_profile_summary(self, customer_id: str) -> str:
         """Get human-readable profile summary"""
         return self.profile_builder.get_profile_summary(customer_id)
+
+    def memory_version(self, customer_id: str) -> int:
+        """Stamp that changes whenever the agent stores a turn for the customer"""
+        return self._memory_versions.get(customer_id, 0)
+
+    def data_version(self, customer_id: str) -> Tuple[int, int]:
+        """(profile version, memory version) for keying UI caches"""
+        return self.profile_builder.profile_version(customer_id), self.memory_version(customer_id)
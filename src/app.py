@@ -886,8 +886,32 @@ if "user_input" not in st.session_state:
     st.session_state.user_input = ""
 
 
+@st.cache_resource(show_spinner=False)
+def get_shared_agent(api_key: str) -> CRMAgent:
+    """One CRMAgent per process (LLM client, compiled graph, memory and profile stores)
+
+    Every browser session reuses it; client lists and chat history stay in
+    st.session_state, so each session keeps its own view on shared stores.
+    """
+    return CRMAgent(
+        openai_api_key=api_key,
+        use_local_memory=True,  # Using local memory for development
+        memory_backend=os.getenv("MEMORY_BACKEND") or None,
+        local_storage_dir=os.getenv("LOCAL_MEMORY_DIR") or None,
+        profile_db_path=os.getenv("PROFILE_DB_PATH") or None,
+        context_token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "800")),
+        sentiment_model_path=os.getenv("SENTIMENT_MODEL_PATH") or None,
+        llm_cache_size=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+        llm_cache_path=os.getenv("LLM_CACHE_PATH") or None,
+        cache_responses=os.getenv("LLM_CACHE_RESPONSES", "false").lower() == "true",
+        semantic_cache=os.getenv("SEMANTIC_CACHE", "false").lower() == "true",
+        semantic_cache_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        semantic_cache_per_customer=os.getenv("SEMANTIC_CACHE_PER_CUSTOMER", "true").lower() == "true"
+    )
+
+
 def initialize_agent():
-    """Initialize the CRM Agent"""
+    """Attach the process-wide CRM Agent to this session"""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         st.error("❌ OPENAI_API_KEY not set in environment variables")
@@ -895,16 +919,42 @@ def initialize_agent():
         return False
 
     try:
-        st.session_state.agent = CRMAgent(
-            openai_api_key=api_key,
-            use_local_memory=True  # Using local memory for development
-        )
+        st.session_state.agent = get_shared_agent(api_key)
         return True
     except Exception as e:
         st.error(f"❌ Failed to initialize agent: {str(e)}")
         return False
 
 
+def dashboard_tabs(labels: list):
+    """Tabs that rerun on selection so only the open tab's content runs, when Streamlit supports it"""
+    try:
+        return st.tabs(labels, key="dashboard_tab", on_change="rerun")
+    except TypeError:
+        return st.tabs(labels)
+
+
+def tab_is_open(tab) -> bool:
+    """Whether a tab is selected; tabs without state tracking always render"""
+    return getattr(tab, "open", None) is not False
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_memories(_agent: CRMAgent, customer_id: str, memory_version: int) -> list:
+    """Client memories, cached until the agent stores another turn for the client"""
+    return _agent.get_customer_memories(customer_id)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_recommendations(_agent: CRMAgent, customer_id: str, profile_version: int) -> list:
+    """Service recommendations, cached until the client's profile changes"""
+    # Try recommend_services first, fallback to recommend_products for backward compatibility
+    try:
+        return _agent.profile_builder.recommend_services(customer_id)
+    except AttributeError:
+        return _agent.profile_builder.recommend_products(customer_id)
+
+
 def add_customer(customer_id: str, customer_name: str, email: str = "", company: str = "", industry: str = ""):
     """Add a new enterprise client"""
     if customer_id in st.session_state.customers:
@@ -922,6 +972,33 @@ def add_customer(customer_id: str, customer_name: str, email: str = "", company:
     return True
 
 
+# Messages shown per page of chat history; "Load earlier" reveals another page
+CHAT_WINDOW = 20
+
+# Reruns only the chat pane when this Streamlit has fragments; otherwise a plain function
+chat_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def rerun_chat():
+    """Rerun the chat fragment, or the whole app on Streamlit versions without fragment reruns"""
+    try:
+        st.rerun(scope="fragment")
+    except TypeError:
+        st.rerun()
+
+
+@st.cache_resource(show_spinner=False)
+def get_agent_avatar() -> str:
+    """Vanco logo icon for agent messages - prefer PNG, fallback to SVG, then emoji (resolved once per process)"""
+    vanco_icon_png = os.path.join(os.path.dirname(__file__), "..", "assets", "vanco_icon.png")
+    vanco_icon_svg = os.path.join(os.path.dirname(__file__), "..", "assets", "vanco_icon.svg")
+    if os.path.exists(vanco_icon_png):
+        return vanco_icon_png
+    if os.path.exists(vanco_icon_svg):
+        return vanco_icon_svg
+    return "💠"
+
+
 def display_chat_messages(customer_id: str):
     """Display chat history with human-centered styled messages"""
     history = st.session_state.chat_history.get(customer_id, [])
@@ -938,13 +1015,20 @@ def display_chat_messages(customer_id: str):
         """, unsafe_allow_html=True)
         return
 
+    # Only the latest window is rendered; earlier pages load on demand
+    windows = st.session_state.setdefault("chat_window", {})
+    visible = windows.get(customer_id, CHAT_WINDOW)
+    hidden = len(history) - visible
+    if hidden > 0 and st.button(
+        f"⬆️ Load earlier messages ({hidden} more)", key=f"load_earlier_{customer_id}", use_container_width=True
+    ):
+        visible += CHAT_WINDOW
+        windows[customer_id] = visible
+
     # Display messages using Streamlit's chat_message with custom avatars
-    # Path to Vanco logo
-    import os
-    vanco_icon_png = os.path.join(os.path.dirname(__file__), "..", "assets", "vanco_icon.png")
-    vanco_icon_svg = os.path.join(os.path.dirname(__file__), "..", "assets", "vanco_icon.svg")
-    
-    for msg in history:
+    agent_avatar = get_agent_avatar()
+
+    for msg in history[-visible:]:
         role = msg.get("role")
         text = msg.get("message")
         timestamp = msg.get("timestamp", "")
@@ -954,19 +1038,9 @@ def display_chat_messages(customer_id: str):
                 st.write(text)
                 st.caption(f"🕐 {timestamp}")
         else:
-            # Use Vanco logo icon - prefer PNG, fallback to SVG, then emoji
-            if os.path.exists(vanco_icon_png):
-                with st.chat_message("assistant", avatar=vanco_icon_png):
-                    st.write(text)
-                    st.caption(f"🕐 {timestamp}")
-            elif os.path.exists(vanco_icon_svg):
-                with st.chat_message("assistant", avatar=vanco_icon_svg):
-                    st.write(text)
-                    st.caption(f"🕐 {timestamp}")
-            else:
-                with st.chat_message("assistant", avatar="💠"):
-                    st.write(text)
-                    st.caption(f"🕐 {timestamp}")
+            with st.chat_message("assistant", avatar=agent_avatar):
+                st.write(text)
+                st.caption(f"🕐 {timestamp}")
 
 
 def display_customer_profile(customer_id: str):
@@ -1218,7 +1292,7 @@ def display_memory_history(customer_id: str):
     """, unsafe_allow_html=True)
     
     # Get memories from agent
-    memories = st.session_state.agent.get_customer_memories(customer_id)
+    memories = load_memories(st.session_state.agent, customer_id, st.session_state.agent.memory_version(customer_id))
     
     col1, col2 = st.columns(2)
     
@@ -1286,11 +1360,9 @@ def display_recommendations(customer_id: str):
     """, unsafe_allow_html=True)
     
     if st.session_state.agent:
-        # Try recommend_services first, fallback to recommend_products for backward compatibility
-        try:
-            recommendations = st.session_state.agent.profile_builder.recommend_services(customer_id)
-        except AttributeError:
-            recommendations = st.session_state.agent.profile_builder.recommend_products(customer_id)
+        recommendations = load_recommendations(
+            st.session_state.agent, customer_id, st.session_state.agent.profile_builder.profile_version(customer_id)
+        )
         
         if recommendations:
             st.markdown("""
@@ -1334,6 +1406,76 @@ def display_recommendations(customer_id: str):
             """, unsafe_allow_html=True)
 
 
+@chat_fragment
+def chat_pane(customer_id: str, customer_info: dict):
+    """Conversation tab; runs as a fragment so chatting doesn't re-execute the other tabs"""
+    # Chat container - streamlined
+    display_chat_messages(customer_id)
+    
+    st.markdown("")
+    
+    # Input section with chat_input for better UX
+    user_message = st.chat_input(
+        placeholder=f"Message {customer_info.get('name', 'client')}... Type your message and press Enter",
+        key="chat_input"
+    )
+    
+    if user_message:
+        # Process message directly
+        customer_name = customer_info.get('name', 'Customer')
+        sent_at = datetime.now().strftime("%I:%M %p")
+
+        with st.chat_message("user", avatar="👤"):
+            st.write(user_message)
+            st.caption(f"🕐 {sent_at}")
+
+        try:
+            # Tokens render as they arrive; profile and memory updates finish before the stream ends
+            with st.chat_message("assistant", avatar=get_agent_avatar()):
+                response = st.write_stream(
+                    st.session_state.agent.stream_customer_message(
+                        customer_id=customer_id,
+                        customer_name=customer_name,
+                        message=user_message
+                    )
+                )
+
+            # Store in chat history
+            st.session_state.chat_history[customer_id].append({
+                "role": "customer",
+                "message": user_message,
+                "timestamp": sent_at
+            })
+            st.session_state.chat_history[customer_id].append({
+                "role": "agent",
+                "message": response,
+                "timestamp": datetime.now().strftime("%I:%M %p")
+            })
+
+            rerun_chat()
+
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+    
+    # Quick action buttons with improved styling
+    st.markdown("#### 💡 Conversation Starters")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        if st.button("🤖 AI Consulting", use_container_width=True, help="Discuss AI consulting services"):
+            pass
+    with col2:
+        if st.button(" New Project", use_container_width=True, help="Start a new project discussion"):
+            pass
+    with col3:
+        if st.button("📅 Schedule Demo", use_container_width=True, help="Schedule a product demo"):
+            pass
+    with col4:
+        if st.button("🗑️ Clear History", use_container_width=True, help="Clear conversation history"):
+            st.session_state.chat_history[customer_id] = []
+            st.session_state.setdefault("chat_window", {}).pop(customer_id, None)
+            rerun_chat()
+
+
 # Main Streamlit App
 def main():
     # Sidebar
@@ -1504,74 +1646,24 @@ def main():
     """, unsafe_allow_html=True)
 
     # Tabs with better styling
-    tab1, tab2, tab3, tab4 = st.tabs(["💬 Conversation", "💼 Client Profile", "🧠 AI Memory", "🎯 Recommendations"])
+    tab1, tab2, tab3, tab4 = dashboard_tabs(["💬 Conversation", "💼 Client Profile", "🧠 AI Memory", "🎯 Recommendations"])
 
+    # Only the selected tab's panel runs (every panel on Streamlit versions without lazy tabs)
     with tab1:
-        # Chat container - streamlined
-        display_chat_messages(customer_id)
-        
-        st.markdown("")
-        
-        # Input section with chat_input for better UX
-        user_message = st.chat_input(
-            placeholder=f"Message {customer_info.get('name', 'client')}... Type your message and press Enter",
-            key="chat_input"
-        )
-        
-        if user_message:
-            # Process message directly
-            customer_name = customer_info.get('name', 'Customer')
-            
-            with st.spinner("💭 Composing personalized response..."):
-                try:
-                    response = st.session_state.agent.process_customer_message(
-                        customer_id=customer_id,
-                        customer_name=customer_name,
-                        message=user_message
-                    )
-
-                    # Store in chat history
-                    st.session_state.chat_history[customer_id].append({
-                        "role": "customer",
-                        "message": user_message,
-                        "timestamp": datetime.now().strftime("%I:%M %p")
-                    })
-                    st.session_state.chat_history[customer_id].append({
-                        "role": "agent",
-                        "message": response,
-                        "timestamp": datetime.now().strftime("%I:%M %p")
-                    })
-                    
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-        
-        # Quick action buttons with improved styling
-        st.markdown("#### 💡 Conversation Starters")
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            if st.button("🤖 AI Consulting", use_container_width=True, help="Discuss AI consulting services"):
-                pass
-        with col2:
-            if st.button(" New Project", use_container_width=True, help="Start a new project discussion"):
-                pass
-        with col3:
-            if st.button("📅 Schedule Demo", use_container_width=True, help="Schedule a product demo"):
-                pass
-        with col4:
-            if st.button("🗑️ Clear History", use_container_width=True, help="Clear conversation history"):
-                st.session_state.chat_history[customer_id] = []
-                st.rerun()
+        if tab_is_open(tab1):
+            chat_pane(customer_id, customer_info)
 
     with tab2:
-        display_customer_profile(customer_id)
+        if tab_is_open(tab2):
+            display_customer_profile(customer_id)
 
     with tab3:
-        display_memory_history(customer_id)
+        if tab_is_open(tab3):
+            display_memory_history(customer_id)
 
     with tab4:
-        display_recommendations(customer_id)
+        if tab_is_open(tab4):
+            display_recommendations(customer_id)
 
     # Footer with Vanco AI branding
     st.markdown("---")
@@ -15,10 +15,29 @@ OPENAI_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
 SUPERMEMORY_API_KEY = os.getenv("SUPERMEMORY_API_KEY", "")
 SUPERMEMORY_BASE_URL = os.getenv("SUPERMEMORY_BASE_URL", "https://api.supermemory.ai")
 USE_LOCAL_MEMORY = os.getenv("USE_LOCAL_MEMORY", "true").lower() == "true"
+# Explicit backend: "local", "vector" (offline embeddings + ANN) or "supermemory"
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "") or None
+# Directory for the durable local memory log; empty keeps local memory in-process only
+LOCAL_MEMORY_DIR = os.getenv("LOCAL_MEMORY_DIR", "") or None
+# SQLite file for client profiles; empty keeps profiles in memory
+PROFILE_DB_PATH = os.getenv("PROFILE_DB_PATH", "") or None
 
 # Agent Configuration
 MAX_MEMORY_RETRIEVAL = int(os.getenv("MAX_MEMORY_RETRIEVAL", "5"))
 MAX_PROFILE_MEMORIES = int(os.getenv("MAX_PROFILE_MEMORIES", "20"))
+# Token budget for the profile/memory context in each response prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "800"))
+# Optional .npz weights for the local hashed n-gram sentiment model
+SENTIMENT_MODEL_PATH = os.getenv("SENTIMENT_MODEL_PATH", "") or None
+
+# LLM Cache Configuration
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))  # 0 disables the cache
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "") or None  # SQLite file for a persistent tier
+LLM_CACHE_RESPONSES = os.getenv("LLM_CACHE_RESPONSES", "false").lower() == "true"
+# Reuse answers to near-duplicate client messages
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_PER_CUSTOMER = os.getenv("SEMANTIC_CACHE_PER_CUSTOMER", "true").lower() == "true"
 
 # Streamlit Configuration
 STREAMLIT_THEME = os.getenv("STREAMLIT_THEME", "light")
@@ -69,6 +88,9 @@ def validate_config():
     if not USE_LOCAL_MEMORY and not SUPERMEMORY_API_KEY:
         errors.append("SUPERMEMORY_API_KEY is required if not using local memory")
 
+    if MEMORY_BACKEND not in (None, "local", "vector", "supermemory"):
+        errors.append(f"Unknown MEMORY_BACKEND: {MEMORY_BACKEND}")
+
     return errors
 
 def print_config():
@@ -85,8 +107,15 @@ def print_config():
     
     Memory Configuration:
       - Use Local Memory: {USE_LOCAL_MEMORY}
+      - Memory Backend: {MEMORY_BACKEND or "auto"}
+      - Local Memory Dir: {LOCAL_MEMORY_DIR or "in-memory only"}
+      - Profile DB Path: {PROFILE_DB_PATH or "in-memory only"}
       - Supermemory API Key Set: {bool(SUPERMEMORY_API_KEY)}
       - Max Memories Retrieved: {MAX_MEMORY_RETRIEVAL}
+      - Context Token Budget: {CONTEXT_TOKEN_BUDGET}
+      - Sentiment Model: {SENTIMENT_MODEL_PATH or "lexicon only"}
+      - LLM Cache: {LLM_CACHE_SIZE} entries, {LLM_CACHE_PATH or "in-memory only"}, responses cached: {LLM_CACHE_RESPONSES}
+      - Semantic Cache: {SEMANTIC_CACHE} (threshold {SEMANTIC_CACHE_THRESHOLD}, per customer: {SEMANTIC_CACHE_PER_CUSTOMER})
     
     Debug Mode: {DEBUG}
     {'='*60}
@@ -0,0 +1,241 @@
+"""
+Token-budgeted context assembly for the response prompt
+
+Renders the client profile as compact "key: value" lines (empty fields are
+dropped), ranks retrieved memories by relevance and recency, and fills the
+prompt context section by section until the token budget is spent. Token
+counts per section are returned alongside the text so callers can log cost.
+"""
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+_ENCODING = None
+
+
+def _encoding():
+    """tiktoken encoding for the response model, or None when unavailable"""
+    global _ENCODING
+    if _ENCODING is None:
+        try:
+            import tiktoken
+            _ENCODING = tiktoken.encoding_for_model("gpt-4")
+        except Exception:
+            _ENCODING = False
+    return _ENCODING or None
+
+
+def count_tokens(text: str) -> int:
+    """Number of prompt tokens in text (approximate without tiktoken)"""
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def _join(values: List[Any]) -> str:
+    return ", ".join(str(value) for value in values if value)
+
+
+class ContextBuilder:
+    """Assembles the response prompt context within a token budget"""
+
+    # Share of the budget each section may use before memories take the rest
+    PROFILE_SHARE = 0.5
+    RECOMMENDATION_SHARE = 0.1
+    # Per-line caps so one long field or memory cannot crowd out the rest
+    MAX_FIELD_TOKENS = 60
+    MAX_MEMORY_TOKENS = 150
+
+    SECTION_HEADERS = {
+        "profile": "Client Profile:",
+        "memories": "Relevant Past Interactions:",
+        "recommendations": "Suggested Services to Recommend:",
+    }
+
+    def __init__(
+        self,
+        token_budget: int = 800,
+        max_memories: int = 5,
+        recency_half_life_days: float = 30.0,
+        relevance_weight: float = 0.7
+    ):
+        """Initialize the context builder
+
+        Args:
+            token_budget: Maximum tokens for the whole context block
+            max_memories: Maximum past interactions to include
+            recency_half_life_days: Age at which a memory's recency score halves
+            relevance_weight: Weight of retrieval relevance vs recency (0-1)
+        """
+        self.token_budget = token_budget
+        self.max_memories = max_memories
+        self.recency_half_life_days = recency_half_life_days
+        self.relevance_weight = relevance_weight
+
+    @staticmethod
+    def render_profile(profile: Optional[Dict[str, Any]]) -> List[str]:
+        """Compact profile lines in priority order, skipping empty fields"""
+        if not profile:
+            return []
+
+        open_issues = [issue["description"] for issue in profile.get("issues_reported", []) if not issue.get("resolved")]
+        fields = [
+            ("name", profile.get("name")),
+            ("company", _join([profile.get("company"), profile.get("company_type")])),
+            ("industry", profile.get("industry")),
+            ("sentiment", profile.get("sentiment_trend") if profile.get("sentiment_trend") != "neutral" else None),
+            ("services", _join(profile.get("service_interests", []))),
+            ("requirements", _join(profile.get("key_requirements", []))),
+            ("interests", _join(profile.get("preferences", []))),
+            ("budget", profile.get("estimated_budget")),
+            ("timeline", profile.get("decision_timeline")),
+            ("open_issues", "; ".join(open_issues[-3:])),
+            ("meetings", "; ".join(
+                f"{meeting['date']} {meeting['time']} {meeting['purpose']}"
+                for meeting in profile.get("scheduled_meetings", [])
+                if meeting.get("status") == "scheduled"
+            )),
+            ("proposed", "; ".join(
+                f"{project['project_name']} ({project['project_type']}, {project['status']})"
+                for project in profile.get("proposed_projects", [])
+            )),
+            ("projects", "; ".join(
+                f"{project['project_name']} ({project['service_category']}, ${project['value']:,.0f}, {project['status']})"
+                for project in profile.get("project_history", [])[-3:]
+            )),
+            ("project_value", f"${profile['project_value']:,.0f}" if profile.get("project_value") else None),
+            ("interactions", profile.get("interaction_count") or None),
+            ("tags", _join(profile.get("tags", []))),
+            ("last_interaction", profile.get("last_interaction_summary")),
+        ]
+        return [f"{key}: {value}" for key, value in fields if value]
+
+    @staticmethod
+    def _memory_time(memory: Dict[str, Any]) -> Optional[datetime]:
+        """Creation time of a memory, if it carries one"""
+        metadata = memory.get("metadata") or {}
+        for value in (metadata.get("timestamp"), memory.get("created_at"), memory.get("createdAt")):
+            if value:
+                try:
+                    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+                except ValueError:
+                    continue
+        return None
+
+    def rank_memories(self, memories: List[Any], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Order memories by blended retrieval relevance and recency"""
+        memories = [
+            memory if isinstance(memory, dict) else {"content": str(memory)}
+            for memory in memories
+        ]
+        if not memories:
+            return []
+
+        now = now or datetime.now()
+        scores = [memory.get("score") for memory in memories]
+        top_score = max((score for score in scores if isinstance(score, (int, float))), default=0)
+
+        ranked = []
+        for rank, memory in enumerate(memories):
+            score = memory.get("score")
+            if isinstance(score, (int, float)) and top_score > 0:
+                relevance = score / top_score
+            else:
+                # Backends return results best-first
+                relevance = 1.0 - rank / len(memories)
+            created = self._memory_time(memory)
+            if created is None:
+                recency = 0.5
+            else:
+                age_days = max((now - created).total_seconds() / 86400, 0.0)
+                recency = 0.5 ** (age_days / self.recency_half_life_days)
+            blended = self.relevance_weight * relevance + (1 - self.relevance_weight) * recency
+            ranked.append((blended, -rank, memory))
+
+        ranked.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [memory for _, _, memory in ranked]
+
+    @staticmethod
+    def _cap(line: str, max_tokens: int) -> str:
+        """Truncate a single line to max_tokens"""
+        capped = truncate_tokens(line, max_tokens)
+        return capped if capped == line else capped + "..."
+
+    @staticmethod
+    def _fill(lines: List[str], budget: int) -> Tuple[List[str], int]:
+        """Take lines in order while they fit; the first that does not is truncated"""
+        kept, used = [], 0
+        for line in lines:
+            tokens = count_tokens(line) + 1  # newline
+            if used + tokens <= budget:
+                kept.append(line)
+                used += tokens
+                continue
+            remaining = budget - used - 1
+            if remaining > 8:
+                kept.append(truncate_tokens(line, remaining) + "...")
+                used = budget
+            break
+        return kept, used
+
+    def build(
+        self,
+        profile: Optional[Dict[str, Any]],
+        memories: List[Any],
+        recommendations: List[str]
+    ) -> Tuple[str, Dict[str, int]]:
+        """Assemble the context block and return it with per-section token counts"""
+        # Headers and blank lines between sections are paid for up front
+        budget = self.token_budget - sum(count_tokens(header) + 2 for header in self.SECTION_HEADERS.values())
+        profile_lines, profile_tokens = self._fill(
+            [self._cap(line, self.MAX_FIELD_TOKENS) for line in self.render_profile(profile)],
+            int(budget * self.PROFILE_SHARE)
+        )
+        recommendation_lines, recommendation_tokens = self._fill(
+            [f"- {rec}" for rec in recommendations], int(budget * self.RECOMMENDATION_SHARE)
+        )
+
+        memory_lines = []
+        for memory in self.rank_memories(memories)[:self.max_memories]:
+            content = memory.get("content") or ""
+            if not content:
+                continue
+            label = memory.get("type") or memory.get("memory_type")
+            line = f"- [{label}] {content}" if label else f"- {content}"
+            memory_lines.append(self._cap(line, self.MAX_MEMORY_TOKENS))
+        memory_lines, memory_tokens = self._fill(
+            memory_lines, budget - profile_tokens - recommendation_tokens
+        )
+
+        sections = []
+        for name, lines in (
+            ("profile", profile_lines), ("memories", memory_lines), ("recommendations", recommendation_lines)
+        ):
+            if lines:
+                sections.append(self.SECTION_HEADERS[name] + "\n" + "\n".join(lines))
+
+        context = "\n\n".join(sections) or "No previous history available for this customer."
+        token_counts = {
+            "profile": profile_tokens,
+            "memories": memory_tokens,
+            "recommendations": recommendation_tokens,
+            "total": count_tokens(context),
+        }
+        return context, token_counts
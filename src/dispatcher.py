@@ -0,0 +1,182 @@
+"""
+Per-customer ordered dispatch of agent turns onto a worker pool
+
+Each customer id hashes to one shard: a bounded FIFO queue drained by a
+single worker thread. A client's messages are therefore processed strictly
+in arrival order (profile extraction and memory writes depend on it) while
+different clients run in parallel on other shards. A full shard blocks the
+submitter for up to enqueue_timeout before the message is rejected.
+"""
+import asyncio
+import atexit
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class CustomerDispatcher:
+    """Shards process_customer_message calls by customer onto worker threads"""
+
+    def __init__(
+        self,
+        agent,
+        num_workers: int = 4,
+        max_queue_size: int = 100,
+        enqueue_timeout: float = 5.0,
+        close_timeout: float = 60.0
+    ):
+        """Initialize the dispatcher
+
+        Args:
+            agent: CRMAgent (anything with process_customer_message)
+            num_workers: Number of shards, each with one worker thread
+            max_queue_size: Queued messages per shard before submitters block
+            enqueue_timeout: Seconds a submitter waits on a full shard
+            close_timeout: Seconds close() waits for queued messages
+        """
+        self.agent = agent
+        self.enqueue_timeout = enqueue_timeout
+        self.close_timeout = close_timeout
+
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max_queue_size) for _ in range(num_workers)]
+        self._lock = threading.Lock()
+        # Submits that passed the closed check and are still putting onto a shard;
+        # close() waits for them so no message lands behind a worker's sentinel
+        self._enqueued = threading.Condition(self._lock)
+        self._enqueuing = 0
+        self._metrics = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._timings = {
+            "queue_wait": {"total": 0.0, "max": 0.0},
+            "processing": {"total": 0.0, "max": 0.0},
+        }
+        self._closed = False
+
+        self._workers = [
+            threading.Thread(target=self._worker, args=(q,), name=f"customer-dispatch-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        atexit.register(self.close)
+
+    def _shard(self, customer_id: str) -> queue.Queue:
+        """Pick the queue that owns a customer's messages"""
+        return self._queues[zlib.crc32(customer_id.encode()) % len(self._queues)]
+
+    def _worker(self, work_queue: queue.Queue) -> None:
+        """Process one shard's messages in order"""
+        while True:
+            task = work_queue.get()
+            if task is None:
+                work_queue.task_done()
+                return
+
+            future, args, enqueued_at = task
+            started = time.perf_counter()
+            outcome = None
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.agent.process_customer_message(*args))
+                    outcome = "completed"
+                except Exception as e:
+                    print(f"Error processing message for {args[0]}: {e}")
+                    future.set_exception(e)
+                    outcome = "failed"
+            finished = time.perf_counter()
+
+            if outcome:
+                with self._lock:
+                    self._metrics[outcome] += 1
+                    self._record("queue_wait", started - enqueued_at)
+                    self._record("processing", finished - started)
+            work_queue.task_done()
+
+    def _record(self, name: str, seconds: float) -> None:
+        timing = self._timings[name]
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+    def submit(self, customer_id: str, customer_name: str, message: str) -> Future:
+        """Queue a message; the future resolves to the agent's reply
+
+        If the customer's shard stays full for enqueue_timeout, the returned
+        future fails with queue.Full.
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                future.set_exception(RuntimeError("Dispatcher is closed"))
+                return future
+            self._enqueuing += 1
+
+        try:
+            self._shard(customer_id).put(
+                (future, (customer_id, customer_name, message), time.perf_counter()),
+                timeout=self.enqueue_timeout
+            )
+        except queue.Full as e:
+            with self._lock:
+                self._enqueuing -= 1
+                self._metrics["rejected"] += 1
+                self._enqueued.notify_all()
+            print(f"Dispatch queue full, rejected message for {customer_id}")
+            future.set_exception(e)
+            return future
+
+        with self._lock:
+            self._enqueuing -= 1
+            self._metrics["submitted"] += 1
+            self._enqueued.notify_all()
+        return future
+
+    async def asubmit(self, customer_id: str, customer_name: str, message: str) -> str:
+        """Queue a message without blocking the event loop and await the reply"""
+        future = await asyncio.to_thread(self.submit, customer_id, customer_name, message)
+        return await asyncio.wrap_future(future)
+
+    def process_many(self, messages: List[Tuple[str, str, str]]) -> List[Optional[str]]:
+        """Dispatch (customer_id, customer_name, message) tuples and return replies in input order
+
+        Failed or rejected messages yield None.
+        """
+        futures = [self.submit(*item) for item in messages]
+        replies = []
+        for future in futures:
+            try:
+                replies.append(future.result())
+            except Exception:
+                replies.append(None)
+        return replies
+
+    def join(self) -> None:
+        """Block until every queued message has been processed"""
+        for work_queue in self._queues:
+            work_queue.join()
+
+    def close(self) -> None:
+        """Finish queued messages and stop the workers"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._enqueued.wait_for(lambda: not self._enqueuing, timeout=self.close_timeout)
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for worker in self._workers:
+            worker.join(self.close_timeout)
+        atexit.unregister(self.close)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Message counts, per-shard queue depth and queue wait vs. processing time"""
+        with self._lock:
+            metrics: Dict[str, Any] = dict(self._metrics)
+            processed = metrics["completed"] + metrics["failed"]
+            for name, timing in self._timings.items():
+                metrics[f"{name}_avg"] = timing["total"] / processed if processed else 0.0
+                metrics[f"{name}_max"] = timing["max"]
+        metrics["queue_depth"] = [work_queue.qsize() for work_queue in self._queues]
+        return metrics
@@ -0,0 +1,189 @@
+"""
+Content-addressed cache for LLM generations
+
+LLMResponseCache exposes LangChain BaseCache views (for_kind), so it plugs
+into a chat model through its `cache` field and is consulted before every
+API call.
+Entries are keyed by a SHA-256 of (llm string, prompt); the llm string
+already encodes the model name, temperature and any bound tools. Hot
+entries live in an in-process LRU; an optional SQLite file keeps them
+across restarts. Each prompt kind (analysis, response, ...) gets its own
+TTL and hit/miss counters through for_kind().
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk
+
+
+# Only chat generations are ever stored; nothing else may be revived from disk
+_ALLOWED_OBJECTS = [ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+
+
+def _revive(value: str) -> Any:
+    """Deserialize stored generations"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", LangChainBetaWarning)
+        return loads(value, allowed_objects=_ALLOWED_OBJECTS)
+
+
+class LLMResponseCache:
+    """Two-tier (LRU + optional SQLite) store for cached generations"""
+
+    # Seconds an entry stays valid, per prompt kind
+    DEFAULT_TTLS = {
+        "analysis": 7 * 24 * 3600.0,
+        "response": 3600.0,
+    }
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None
+    ):
+        """Initialize the cache
+
+        Args:
+            max_entries: Maximum entries kept in the in-process LRU
+            path: Optional SQLite file for a persistent second tier
+            ttls: Per-kind TTL overrides in seconds
+        """
+        self.max_entries = max_entries
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        """Content address for a prompt under a model configuration"""
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode()).hexdigest()
+
+    def for_kind(self, kind: str) -> "KindCache":
+        """BaseCache view that applies the TTL and metrics of one prompt kind"""
+        return KindCache(self, kind)
+
+    def _count(self, kind: str, outcome: str) -> None:
+        counters = self._metrics.setdefault(kind, {"hits": 0, "disk_hits": 0, "misses": 0, "writes": 0})
+        counters[outcome] += 1
+
+    def get(self, kind: str, key: str) -> Optional[Sequence[Any]]:
+        """Cached generations for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count(kind, "hits")
+                    return _revive(value)
+                del self._entries[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[1], row[0])
+                    self._count(kind, "disk_hits")
+                    return _revive(row[0])
+
+            self._count(kind, "misses")
+            return None
+
+    def put(self, kind: str, key: str, generations: Sequence[Any]) -> None:
+        """Store generations for key with the kind's TTL"""
+        expires_at = time.time() + self.ttls.get(kind, self.DEFAULT_TTLS["analysis"])
+        value = dumps(list(generations))
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._count(kind, "writes")
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO llm_cache (key, kind, value, expires_at) VALUES (?, ?, ?, ?)",
+                        (key, kind, value, expires_at)
+                    )
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        """Insert into the LRU tier, evicting the least recently used entries"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_cache")
+
+    def prune(self) -> int:
+        """Delete expired entries from both tiers; returns how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            removed = len(expired)
+            if self._conn is not None:
+                with self._conn:
+                    removed += self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+            return removed
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters per prompt kind and current LRU size"""
+        with self._lock:
+            metrics = {kind: dict(counters) for kind, counters in self._metrics.items()}
+            for counters in metrics.values():
+                lookups = counters["hits"] + counters["disk_hits"] + counters["misses"]
+                counters["hit_rate"] = (counters["hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+            return {"entries": len(self._entries), "kinds": metrics}
+
+    def close(self) -> None:
+        """Close the SQLite tier"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class KindCache(BaseCache):
+    """LangChain cache adapter bound to one prompt kind of an LLMResponseCache"""
+
+    def __init__(self, store: LLMResponseCache, kind: str):
+        self.store = store
+        self.kind = kind
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        return self.store.get(self.kind, self.store.make_key(prompt, llm_string))
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        self.store.put(self.kind, self.store.make_key(prompt, llm_string), return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
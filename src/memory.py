@@ -2,12 +2,27 @@
 Memory module for storing and retrieving customer interactions using Supermemory.ai
 """
 import os
+import re
+import math
+import atexit
+import asyncio
+import queue
+import threading
+import time
+import zlib
 import requests
+import aiohttp
 import json
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
 
+from utils import LockStripes
+
 
 class MemoryItem(BaseModel):
     """Model for memory items"""
@@ -19,25 +34,149 @@ class MemoryItem(BaseModel):
 class SupermemoryManager:
     """Manager for Supermemory.ai vector memory storage"""
 
-    def __init__(self, api_key: str, base_url: str = "https://api.supermemory.ai"):
-        """Initialize Supermemory manager"""
+    # Per-operation timeouts in seconds; searches sit on the reply path, so fail fast
+    DEFAULT_TIMEOUTS = {
+        "namespace": 5.0,
+        "store": 10.0,
+        "search": 5.0,
+        "list": 10.0,
+        "delete": 10.0,
+        "update": 10.0,
+    }
+
+    # Throttling and transient server errors are retried with backoff
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.supermemory.ai",
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeouts: Optional[Dict[str, float]] = None,
+        namespace_ttl: float = 3600.0
+    ):
+        """Initialize Supermemory manager with a pooled keep-alive session"""
         self.api_key = api_key
         self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self.pool_size = pool_size
+        self.timeouts = {**self.DEFAULT_TIMEOUTS, **(timeouts or {})}
+
+        # Shared session reuses TCP+TLS connections across calls. POST is
+        # retried too: search and namespace creation are idempotent, and a
+        # rare duplicate memory is preferable to losing one on a 503.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUS_CODES,
+            allowed_methods=None,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # One aiohttp session (and its shutdown guard) per event loop
+        self._async_sessions: Dict[asyncio.AbstractEventLoop, Tuple[aiohttp.ClientSession, Any]] = {}
+        self._async_sessions_lock = threading.Lock()
+
+        # customer_id -> monotonic expiry of "namespace known to exist"
+        self.namespace_ttl = namespace_ttl
+        self._known_namespaces: Dict[str, float] = {}
+        self._namespace_lock = threading.Lock()
+
+        # Flipped off the first time the backend rejects the batch endpoint
+        self._batch_supported = True
+        self._pipeline_executor: Optional[ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        if self._pipeline_executor is not None:
+            self._pipeline_executor.shutdown(wait=True)
+            self._pipeline_executor = None
+        self.session.close()
+        with self._async_sessions_lock:
+            sessions = self._async_sessions
+            self._async_sessions = {}
+        for owner, (session, _) in sessions.items():
+            self._retire_async_session(owner, session)
+
+    def _namespace_known(self, customer_id: str) -> bool:
+        """Whether the namespace was confirmed to exist within the TTL"""
+        with self._namespace_lock:
+            expires_at = self._known_namespaces.get(customer_id)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._known_namespaces[customer_id]
+                return False
+            return True
+
+    def _remember_namespace(self, customer_id: str) -> None:
+        """Cache that a namespace exists"""
+        with self._namespace_lock:
+            self._known_namespaces[customer_id] = time.monotonic() + self.namespace_ttl
+
+    def invalidate_namespace(self, customer_id: Optional[str] = None) -> None:
+        """Forget a cached namespace, or all of them when customer_id is None"""
+        with self._namespace_lock:
+            if customer_id is None:
+                self._known_namespaces.clear()
+            else:
+                self._known_namespaces.pop(customer_id, None)
+
+    def warm_namespace_cache(self, page_size: int = 1000) -> int:
+        """Seed the namespace cache from a bulk listing; returns namespaces cached"""
+        cached = 0
+        cursor = None
+        try:
+            while True:
+                params = {"limit": page_size}
+                if cursor:
+                    params["cursor"] = cursor
+                response = self.session.get(
+                    f"{self.base_url}/namespaces",
+                    params=params,
+                    timeout=self.timeouts["list"]
+                )
+                if response.status_code != 200:
+                    break
+                body = response.json()
+                for namespace in body.get("namespaces", []):
+                    namespace_id = namespace.get("namespace_id", "") if isinstance(namespace, dict) else str(namespace)
+                    if namespace_id.startswith("customer_"):
+                        self._remember_namespace(namespace_id[len("customer_"):])
+                        cached += 1
+                cursor = body.get("next_cursor")
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"Error listing namespaces: {e}")
+        return cached
 
     def create_memory_namespace(self, customer_id: str) -> bool:
-        """Create a unique namespace for each customer"""
+        """Create a unique namespace for each customer (cached per process)"""
+        if self._namespace_known(customer_id):
+            return True
         try:
             endpoint = f"{self.base_url}/namespaces"
             data = {
                 "namespace_id": f"customer_{customer_id}",
                 "description": f"Memory namespace for customer {customer_id}"
             }
-            response = requests.post(endpoint, headers=self.headers, json=data, timeout=10)
-            return response.status_code in [200, 201, 409]  # 409 = already exists
+            response = self.session.post(endpoint, json=data, timeout=self.timeouts["namespace"])
+            created = response.status_code in [200, 201, 409]  # 409 = already exists
+            if created:
+                self._remember_namespace(customer_id)
+            return created
         except Exception as e:
             print(f"Error creating namespace: {e}")
             return False
@@ -51,32 +190,73 @@ class SupermemoryManager:
     ) -> bool:
         """Store customer memory/interaction in Supermemory.ai"""
         try:
-            if metadata is None:
-                metadata = {}
-
             endpoint = f"{self.base_url}/memories"
-            memory_data = {
-                "namespace_id": f"customer_{customer_id}",
-                "content": content,
-                "type": memory_type,
-                "metadata": {
-                    **metadata,
-                    "timestamp": datetime.now().isoformat(),
-                    "customer_id": customer_id
-                }
-            }
+            memory_data = self._memory_payload(customer_id, content, memory_type, metadata)
 
-            response = requests.post(
+            response = self.session.post(
                 endpoint,
-                headers=self.headers,
                 json=memory_data,
-                timeout=10
+                timeout=self.timeouts["store"]
             )
+            if response.status_code == 404:
+                self.invalidate_namespace(customer_id)  # namespace was removed server-side
             return response.status_code in [200, 201]
         except Exception as e:
             print(f"Error storing memory: {e}")
             return False
 
+    def store_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Store several memories in one round-trip
+
+        Each item holds content, memory_type and optional metadata. Uses the
+        batch endpoint when available, otherwise pipelines the individual
+        stores concurrently over the pooled session.
+        """
+        if not items:
+            return True
+
+        payloads = [self._memory_payload(customer_id, **item) for item in items]
+        if self._batch_supported:
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/memories/batch",
+                    json={"memories": payloads},
+                    timeout=self.timeouts["store"]
+                )
+                if response.status_code in [404, 405]:
+                    self._batch_supported = False
+                else:
+                    return response.status_code in [200, 201]
+            except Exception as e:
+                print(f"Error storing memories: {e}")
+                return False
+
+        if self._pipeline_executor is None:
+            self._pipeline_executor = ThreadPoolExecutor(max_workers=self.pool_size)
+        results = self._pipeline_executor.map(
+            lambda item: self.store_memory(customer_id, **item), items
+        )
+        return all(list(results))
+
+    def _memory_payload(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Build the request body for storing a memory"""
+        return {
+            "namespace_id": f"customer_{customer_id}",
+            "content": content,
+            "type": memory_type,
+            "metadata": {
+                **(metadata or {}),
+                "timestamp": datetime.now().isoformat(),
+                "customer_id": customer_id
+            }
+        }
+
     def retrieve_memories(
         self,
         customer_id: str,
@@ -95,11 +275,10 @@ class SupermemoryManager:
             if memory_type:
                 search_params["type"] = memory_type
 
-            response = requests.post(
+            response = self.session.post(
                 endpoint,
-                headers=self.headers,
                 json=search_params,
-                timeout=10
+                timeout=self.timeouts["search"]
             )
 
             if response.status_code == 200:
@@ -117,11 +296,10 @@ class SupermemoryManager:
                 "namespace_id": f"customer_{customer_id}",
                 "limit": limit
             }
-            response = requests.get(
+            response = self.session.get(
                 endpoint,
-                headers=self.headers,
                 params=params,
-                timeout=10
+                timeout=self.timeouts["list"]
             )
 
             if response.status_code == 200:
@@ -136,11 +314,10 @@ class SupermemoryManager:
         try:
             endpoint = f"{self.base_url}/memories/{memory_id}"
             params = {"namespace_id": f"customer_{customer_id}"}
-            response = requests.delete(
+            response = self.session.delete(
                 endpoint,
-                headers=self.headers,
                 params=params,
-                timeout=10
+                timeout=self.timeouts["delete"]
             )
             return response.status_code in [200, 204]
         except Exception as e:
@@ -162,31 +339,487 @@ class SupermemoryManager:
                 "content": content,
                 "metadata": metadata or {}
             }
-            response = requests.put(
+            response = self.session.put(
                 endpoint,
-                headers=self.headers,
                 json=update_data,
-                timeout=10
+                timeout=self.timeouts["update"]
             )
             return response.status_code == 200
         except Exception as e:
             print(f"Error updating memory: {e}")
             return False
 
+    # Async API (aiohttp) - mirrors the sync methods for use from event loops
 
-class LocalMemoryManager:
-    """Fallback local memory manager for development/testing without Supermemory.ai"""
+    async def _get_async_session(self) -> aiohttp.ClientSession:
+        """Get the aiohttp session for the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._async_sessions_lock:
+            stale = [(owner, entry) for owner, entry in self._async_sessions.items() if owner.is_closed()]
+            for owner, _ in stale:
+                del self._async_sessions[owner]
+            entry = self._async_sessions.get(loop)
+            created = entry is None or entry[0].closed
+            if created:
+                session = aiohttp.ClientSession(
+                    headers=self.headers,
+                    connector=aiohttp.TCPConnector(limit=self.pool_size)
+                )
+                entry = self._async_sessions[loop] = (session, self._session_guard(session))
+        for owner, (session, _) in stale:
+            self._retire_async_session(owner, session)
+        if created:
+            # First iteration registers the guard with the loop's asyncgen hooks
+            await entry[1].__anext__()
+        return entry[0]
+
+    @staticmethod
+    async def _session_guard(session: aiohttp.ClientSession):
+        """Async generator whose finalizer closes a session while its loop still runs
+
+        asyncio.run() (and any loop calling shutdown_asyncgens()) finalizes
+        live async generators before closing the loop, so each per-run session
+        is closed on its own loop instead of leaking its connector.
+        """
+        try:
+            yield
+        finally:
+            if not session.closed:
+                await session.close()
+
+    @staticmethod
+    def _retire_async_session(loop: asyncio.AbstractEventLoop, session: aiohttp.ClientSession) -> None:
+        """Close a session owned by another event loop without awaiting it"""
+        if session.closed:
+            return
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        elif loop.is_closed():
+            # Loop closed without shutdown_asyncgens(); its transports went with it
+            session.detach()
+
+    def _async_timeout(self, operation: str) -> aiohttp.ClientTimeout:
+        """Per-operation timeout for aiohttp requests"""
+        return aiohttp.ClientTimeout(total=self.timeouts[operation])
+
+    async def aclose(self) -> None:
+        """Close the aiohttp sessions (awaiting the one on the running loop)"""
+        loop = asyncio.get_running_loop()
+        with self._async_sessions_lock:
+            sessions = self._async_sessions
+            self._async_sessions = {}
+        for owner, (session, _) in sessions.items():
+            if owner is loop:
+                if not session.closed:
+                    await session.close()
+            else:
+                self._retire_async_session(owner, session)
+
+    async def acreate_memory_namespace(self, customer_id: str) -> bool:
+        """Async variant of create_memory_namespace"""
+        if self._namespace_known(customer_id):
+            return True
+        try:
+            session = await self._get_async_session()
+            data = {
+                "namespace_id": f"customer_{customer_id}",
+                "description": f"Memory namespace for customer {customer_id}"
+            }
+            async with session.post(
+                f"{self.base_url}/namespaces", json=data, timeout=self._async_timeout("namespace")
+            ) as response:
+                created = response.status in [200, 201, 409]  # 409 = already exists
+                if created:
+                    self._remember_namespace(customer_id)
+                return created
+        except Exception as e:
+            print(f"Error creating namespace: {e}")
+            return False
+
+    async def astore_memory(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of store_memory"""
+        try:
+            session = await self._get_async_session()
+            memory_data = self._memory_payload(customer_id, content, memory_type, metadata)
+            async with session.post(
+                f"{self.base_url}/memories", json=memory_data, timeout=self._async_timeout("store")
+            ) as response:
+                if response.status == 404:
+                    self.invalidate_namespace(customer_id)
+                return response.status in [200, 201]
+        except Exception as e:
+            print(f"Error storing memory: {e}")
+            return False
+
+    async def astore_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Async variant of store_memories"""
+        if not items:
+            return True
+
+        payloads = [self._memory_payload(customer_id, **item) for item in items]
+        if self._batch_supported:
+            try:
+                session = await self._get_async_session()
+                async with session.post(
+                    f"{self.base_url}/memories/batch",
+                    json={"memories": payloads},
+                    timeout=self._async_timeout("store")
+                ) as response:
+                    if response.status in [404, 405]:
+                        self._batch_supported = False
+                    else:
+                        return response.status in [200, 201]
+            except Exception as e:
+                print(f"Error storing memories: {e}")
+                return False
+
+        results = await asyncio.gather(
+            *(self.astore_memory(customer_id, **item) for item in items)
+        )
+        return all(results)
+
+    async def aretrieve_memories(
+        self,
+        customer_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of retrieve_memories"""
+        try:
+            session = await self._get_async_session()
+            search_params = {
+                "namespace_id": f"customer_{customer_id}",
+                "query": query,
+                "limit": limit
+            }
+            if memory_type:
+                search_params["type"] = memory_type
+
+            async with session.post(
+                f"{self.base_url}/memories/search", json=search_params, timeout=self._async_timeout("search")
+            ) as response:
+                if response.status == 200:
+                    return (await response.json(content_type=None)).get("results", [])
+                return []
+        except Exception as e:
+            print(f"Error retrieving memories: {e}")
+            return []
+
+    async def aget_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Async variant of get_all_memories"""
+        try:
+            session = await self._get_async_session()
+            params = {
+                "namespace_id": f"customer_{customer_id}",
+                "limit": limit
+            }
+            async with session.get(
+                f"{self.base_url}/memories", params=params, timeout=self._async_timeout("list")
+            ) as response:
+                if response.status == 200:
+                    return (await response.json(content_type=None)).get("memories", [])
+                return []
+        except Exception as e:
+            print(f"Error getting all memories: {e}")
+            return []
+
+    async def adelete_memory(self, customer_id: str, memory_id: str) -> bool:
+        """Async variant of delete_memory"""
+        try:
+            session = await self._get_async_session()
+            params = {"namespace_id": f"customer_{customer_id}"}
+            async with session.delete(
+                f"{self.base_url}/memories/{memory_id}", params=params, timeout=self._async_timeout("delete")
+            ) as response:
+                return response.status in [200, 204]
+        except Exception as e:
+            print(f"Error deleting memory: {e}")
+            return False
+
+    async def aupdate_memory(
+        self,
+        customer_id: str,
+        memory_id: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of update_memory"""
+        try:
+            session = await self._get_async_session()
+            update_data = {
+                "namespace_id": f"customer_{customer_id}",
+                "content": content,
+                "metadata": metadata or {}
+            }
+            async with session.put(
+                f"{self.base_url}/memories/{memory_id}", json=update_data, timeout=self._async_timeout("update")
+            ) as response:
+                return response.status == 200
+        except Exception as e:
+            print(f"Error updating memory: {e}")
+            return False
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Very common words carry no retrieval signal and make posting lists huge
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for",
+    "from", "have", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our",
+    "so", "that", "the", "this", "to", "us", "was", "we", "what", "with", "you", "your"
+})
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class _Postings:
+    """Growable NumPy posting list for one token; removals leave tf=0 tombstones"""
+
+    __slots__ = ("ids", "frequencies", "size", "live")
+
+    def __init__(self, np):
+        self.ids = np.empty(4, dtype=np.int64)
+        self.frequencies = np.empty(4, dtype=np.float64)
+        self.size = 0
+        self.live = 0
+
+    def add(self, np, doc_id: int, frequency: int) -> None:
+        if self.size == len(self.ids):
+            self.ids = np.resize(self.ids, 2 * self.size)
+            self.frequencies = np.resize(self.frequencies, 2 * self.size)
+        self.ids[self.size] = doc_id
+        self.frequencies[self.size] = frequency
+        self.size += 1
+        self.live += 1
+
+    def remove(self, np, doc_id: int) -> None:
+        ids, frequencies = self.ids[:self.size], self.frequencies[:self.size]
+        positions = np.flatnonzero((ids == doc_id) & (frequencies > 0))
+        if not len(positions):
+            return
+        frequencies[positions] = 0
+        self.live -= len(positions)
+        if self.live and self.live * 2 < self.size:
+            keep = frequencies > 0
+            self.ids = ids[keep].copy()
+            self.frequencies = frequencies[keep].copy()
+            self.size = self.live
+
+
+class _KeywordIndex:
+    """Per-customer inverted index (token -> NumPy posting arrays) with BM25 scoring
+
+    A search scores each query token's whole posting list in one vectorized
+    pass and sums them with bincount, so the cost per posting is a few
+    nanoseconds instead of a Python dict update.
+    """
+
+    K1 = 1.5
+    B = 0.75
 
     def __init__(self):
+        # Imported lazily like the other NumPy-backed helpers
+        import numpy as np
+
+        self._np = np
+        self.postings: Dict[str, _Postings] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        # doc_lengths as an array indexed by memory id, for vectorized length norms
+        self._lengths = np.zeros(16, dtype=np.float64)
+        self.total_length = 0
+
+    def add(self, doc_id: int, text: str) -> None:
+        """Index a memory's content"""
+        np = self._np
+        counts = Counter(_tokenize(text))
+        for token, frequency in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = _Postings(np)
+            posting.add(np, doc_id, frequency)
+        length = sum(counts.values())
+        if doc_id >= len(self._lengths):
+            self._lengths = np.resize(self._lengths, max(2 * len(self._lengths), doc_id + 1))
+        self._lengths[doc_id] = length
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: int, text: str) -> None:
+        """Drop a memory using the content it was indexed with"""
+        for token in set(_tokenize(text)):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.remove(self._np, doc_id)
+                if not posting.live:
+                    del self.postings[token]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        accept: Optional[Callable[[int], bool]] = None
+    ) -> List[Tuple[int, float]]:
+        """Top-k (memory_id, score) pairs; ties favour the most recent memory"""
+        np = self._np
+        doc_count = len(self.doc_lengths)
+        if not doc_count or limit <= 0:
+            return []
+        average_length = (self.total_length / doc_count) or 1.0
+        base_norm = self.K1 * (1 - self.B)
+        length_weight = self.K1 * self.B / average_length
+
+        ids, contributions = [], []
+        for token in set(_tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            idf = math.log(1 + (doc_count - posting.live + 0.5) / (posting.live + 0.5))
+            token_ids = posting.ids[:posting.size]
+            frequencies = posting.frequencies[:posting.size]
+            ids.append(token_ids)
+            contributions.append(
+                idf * (self.K1 + 1) * frequencies / (frequencies + base_norm + length_weight * self._lengths[token_ids])
+            )
+        if not ids:
+            return []
+        scores = np.bincount(np.concatenate(ids), weights=np.concatenate(contributions))
+        candidates = np.flatnonzero(scores > 0)
+
+        # Rank the best `window` candidates; widen only if accept rejects too many
+        window = limit if accept is None else 4 * limit
+        while True:
+            if len(candidates) > window:
+                candidate_scores = scores[candidates]
+                kth = np.partition(candidate_scores, len(candidates) - window)[len(candidates) - window]
+                top = candidates[candidate_scores >= kth]  # keeps every tie at the cut
+            else:
+                top = candidates
+            top = top[np.lexsort((-top, -scores[top]))]
+            hits = []
+            for doc_id in top.tolist():
+                if accept is None or accept(doc_id):
+                    hits.append((doc_id, float(scores[doc_id])))
+                    if len(hits) == limit:
+                        return hits
+            if len(top) == len(candidates):
+                return hits
+            window *= 4
+
+
+class LocalMemoryManager:
+    """Fallback local memory manager for development/testing without Supermemory.ai
+
+    With storage_dir set, every change is also appended to an on-disk log
+    (see memory_log.py) and customers are loaded lazily from it on first use,
+    so memories survive restarts without a full replay at startup.
+    """
+
+    def __init__(
+        self,
+        storage_dir: Optional[str] = None,
+        fsync_interval: float = 1.0,
+        compact_threshold: int = 10000
+    ):
         """Initialize local memory storage"""
         self.memories: Dict[str, List[Dict[str, Any]]] = {}
+        # Per-customer lookup by id, keyword index and next id (ids are never reused)
+        self._entries: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._indexes: Dict[str, _KeywordIndex] = {}
+        self._next_ids: Dict[str, int] = {}
+        # Per-customer stripes guard the above; compaction takes every stripe
+        self._locks = LockStripes()
+        self._garbage_lock = threading.Lock()
+
+        self._log = None
+        self.compact_threshold = compact_threshold
+        if storage_dir:
+            # Imported lazily so the in-memory mode needs no extra dependencies
+            from memory_log import MemoryLog
+            self._log = MemoryLog(storage_dir, fsync_interval)
+            self._garbage = self._log.garbage_count()
+            atexit.register(self.close)
 
     def create_memory_namespace(self, customer_id: str) -> bool:
-        """Create a namespace"""
-        if customer_id not in self.memories:
-            self.memories[customer_id] = []
+        """Create a namespace (loading the customer's history in durable mode)"""
+        with self._locks.for_key(customer_id):
+            if customer_id not in self.memories:
+                self.memories[customer_id] = []
+                self._entries[customer_id] = {}
+                self._indexes[customer_id] = _KeywordIndex()
+                self._next_ids[customer_id] = 0
+                if self._log is not None:
+                    for record in self._log.records_for(customer_id):
+                        self._replay(customer_id, record)
         return True
 
+    def _ensure_loaded(self, customer_id: str) -> bool:
+        """Whether the customer has a namespace, loading it from disk if needed"""
+        if customer_id in self.memories:
+            return True
+        if self._log is None:
+            return False
+        return self.create_memory_namespace(customer_id)
+
+    def _replay(self, customer_id: str, record: Dict[str, Any]) -> None:
+        """Apply one logged record to the in-memory state"""
+        op = record["op"]
+        if op == "store":
+            self._apply_store(customer_id, record["memory"])
+        elif op == "update":
+            self._apply_update(customer_id, record["id"], record["content"], record.get("metadata"))
+        elif op == "delete":
+            self._apply_delete(customer_id, record["id"])
+        elif op == "namespace":
+            self._next_ids[customer_id] = max(self._next_ids[customer_id], record["next_id"])
+
+    def _record_change(self, record: Dict[str, Any]) -> None:
+        """Append a change to the log, counting records it supersedes"""
+        if self._log is None:
+            return
+        self._log.append(record)
+        if record["op"] in ("update", "delete"):
+            with self._garbage_lock:
+                self._garbage += 1
+
+    def _maybe_compact(self) -> None:
+        """Compact once superseded records pile up (call without holding a stripe)"""
+        if self._log is None or self._garbage < self.compact_threshold:
+            return
+        with self._locks.all():
+            # Another thread may have compacted while we waited
+            if self._garbage >= self.compact_threshold:
+                self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the on-disk log as a snapshot of the live memories"""
+        if self._log is None:
+            return
+        with self._locks.all():
+            for customer_id in self._log.customer_ids():
+                self._ensure_loaded(customer_id)
+            self._log.compact(self.memories, self._next_ids)
+            with self._garbage_lock:
+                self._garbage = 0
+
+    def invalidate_namespace(self, customer_id: Optional[str] = None) -> None:
+        """Local namespaces are plain dict keys, nothing is cached"""
+        return None
+
+    def warm_namespace_cache(self, page_size: int = 1000) -> int:
+        """Local namespaces are always known"""
+        return len(self.memories)
+
     def store_memory(
         self,
         customer_id: str,
@@ -195,19 +828,33 @@ class LocalMemoryManager:
         metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Store memory locally"""
-        self.create_memory_namespace(customer_id)
-        memory_entry = {
-            "id": len(self.memories[customer_id]),
-            "content": content,
-            "type": memory_type,
-            "metadata": {
-                **(metadata or {}),
-                "timestamp": datetime.now().isoformat()
+        with self._locks.for_key(customer_id):
+            self.create_memory_namespace(customer_id)
+            memory_entry = {
+                "id": self._next_ids[customer_id],
+                "content": content,
+                "type": memory_type,
+                "metadata": {
+                    **(metadata or {}),
+                    "timestamp": datetime.now().isoformat()
+                }
             }
-        }
-        self.memories[customer_id].append(memory_entry)
+            self._apply_store(customer_id, memory_entry)
+            self._record_change({"op": "store", "customer_id": customer_id, "memory": memory_entry})
         return True
 
+    def _apply_store(self, customer_id: str, memory_entry: Dict[str, Any]) -> None:
+        """Add a memory entry to the list, id lookup and keyword index"""
+        memory_id = memory_entry["id"]
+        self._next_ids[customer_id] = max(self._next_ids[customer_id], memory_id + 1)
+        self.memories[customer_id].append(memory_entry)
+        self._entries[customer_id][memory_id] = memory_entry
+        self._indexes[customer_id].add(memory_id, memory_entry["content"])
+
+    def store_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Store several memories locally"""
+        return all([self.store_memory(customer_id, **item) for item in items])
+
     def retrieve_memories(
         self,
         customer_id: str,
@@ -215,33 +862,46 @@ class LocalMemoryManager:
         limit: int = 5,
         memory_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Retrieve memories (simple keyword matching)"""
-        if customer_id not in self.memories:
-            return []
+        """Retrieve memories ranked by BM25 keyword relevance"""
+        with self._locks.for_key(customer_id):
+            if not self._ensure_loaded(customer_id):
+                return []
 
-        memories = self.memories[customer_id]
-        if memory_type:
-            memories = [m for m in memories if m["type"] == memory_type]
+            entries = self._entries[customer_id]
+            accept = None
+            if memory_type:
+                accept = lambda memory_id: entries[memory_id]["type"] == memory_type
 
-        # Simple keyword matching
-        query_lower = query.lower()
-        relevant = [m for m in memories if query_lower in m["content"].lower()]
-        return relevant[:limit]
+            hits = self._indexes[customer_id].search(query, limit, accept)
+            return [entries[memory_id] for memory_id, _ in hits]
 
     def get_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
         """Get all memories"""
-        if customer_id not in self.memories:
-            return []
-        return self.memories[customer_id][-limit:]
+        with self._locks.for_key(customer_id):
+            if not self._ensure_loaded(customer_id):
+                return []
+            return self.memories[customer_id][-limit:]
 
     def delete_memory(self, customer_id: str, memory_id: str) -> bool:
         """Delete memory"""
-        if customer_id in self.memories:
-            self.memories[customer_id] = [
-                m for m in self.memories[customer_id] if m.get("id") != int(memory_id)
-            ]
-            return True
-        return False
+        with self._locks.for_key(customer_id):
+            if not self._ensure_loaded(customer_id):
+                return False
+            if self._apply_delete(customer_id, int(memory_id)):
+                self._record_change({"op": "delete", "customer_id": customer_id, "id": int(memory_id)})
+        self._maybe_compact()
+        return True
+
+    def _apply_delete(self, customer_id: str, memory_id: int) -> bool:
+        """Remove a memory from the list, id lookup and keyword index"""
+        memory = self._entries[customer_id].pop(memory_id, None)
+        if memory is None:
+            return False
+        self._indexes[customer_id].remove(memory_id, memory["content"])
+        self.memories[customer_id] = [
+            m for m in self.memories[customer_id] if m.get("id") != memory_id
+        ]
+        return True
 
     def update_memory(
         self,
@@ -251,11 +911,347 @@ class LocalMemoryManager:
         metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Update memory"""
-        if customer_id in self.memories:
-            for memory in self.memories[customer_id]:
-                if memory.get("id") == int(memory_id):
-                    memory["content"] = content
-                    if metadata:
-                        memory["metadata"].update(metadata)
-                    return True
-        return False
+        with self._locks.for_key(customer_id):
+            if not (self._ensure_loaded(customer_id) and self._apply_update(customer_id, int(memory_id), content, metadata)):
+                return False
+            self._record_change({
+                "op": "update",
+                "customer_id": customer_id,
+                "id": int(memory_id),
+                "content": content,
+                "metadata": metadata
+            })
+        self._maybe_compact()
+        return True
+
+    def _apply_update(
+        self,
+        customer_id: str,
+        memory_id: int,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Replace a memory's content and reindex it"""
+        memory = self._entries[customer_id].get(memory_id)
+        if memory is None:
+            return False
+        index = self._indexes[customer_id]
+        index.remove(memory_id, memory["content"])
+        memory["content"] = content
+        index.add(memory_id, content)
+        if metadata:
+            memory["metadata"].update(metadata)
+        return True
+
+    def close(self) -> None:
+        """Flush and close the on-disk log in durable mode"""
+        if self._log is not None:
+            self._log.close()
+            atexit.unregister(self.close)
+
+    # Async API - local storage never blocks, so these delegate to the sync methods
+
+    async def acreate_memory_namespace(self, customer_id: str) -> bool:
+        """Async variant of create_memory_namespace"""
+        return self.create_memory_namespace(customer_id)
+
+    async def astore_memory(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of store_memory"""
+        return self.store_memory(customer_id, content, memory_type, metadata)
+
+    async def astore_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Async variant of store_memories"""
+        return self.store_memories(customer_id, items)
+
+    async def aretrieve_memories(
+        self,
+        customer_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of retrieve_memories"""
+        return self.retrieve_memories(customer_id, query, limit, memory_type)
+
+    async def aget_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Async variant of get_all_memories"""
+        return self.get_all_memories(customer_id, limit)
+
+    async def adelete_memory(self, customer_id: str, memory_id: str) -> bool:
+        """Async variant of delete_memory"""
+        return self.delete_memory(customer_id, memory_id)
+
+    async def aupdate_memory(
+        self,
+        customer_id: str,
+        memory_id: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of update_memory"""
+        return self.update_memory(customer_id, memory_id, content, metadata)
+
+    async def aclose(self) -> None:
+        """Nothing to release for local storage"""
+        return None
+
+
+class WriteBehindMemoryManager:
+    """Write-behind wrapper that persists memories on background worker threads
+
+    Stores are queued and acknowledged immediately, so replies no longer wait
+    on the backend. Writes are sharded by customer onto per-worker bounded
+    queues, which keeps each customer's writes in order. Reads for a customer
+    first wait for that customer's pending writes (read-your-writes).
+    """
+
+    def __init__(
+        self,
+        backend,
+        num_workers: int = 2,
+        max_queue_size: int = 1000,
+        enqueue_timeout: float = 1.0,
+        flush_timeout: float = 10.0
+    ):
+        """Wrap a SupermemoryManager or LocalMemoryManager"""
+        self.backend = backend
+        self.enqueue_timeout = enqueue_timeout
+        self.flush_timeout = flush_timeout
+
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max_queue_size) for _ in range(num_workers)]
+        self._pending: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._metrics = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0}
+        # Stores that passed the _closed check and are still putting onto a queue;
+        # close() waits for them so nothing lands behind a worker's sentinel
+        self._enqueuing = 0
+        self._closed = False
+
+        self._workers = [
+            threading.Thread(target=self._worker, args=(q,), name=f"memory-writer-{i}", daemon=True)
+            for i, q in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        # Flush queued writes if the process exits without calling close()
+        atexit.register(self.close)
+
+    def _shard(self, customer_id: str) -> queue.Queue:
+        """Pick the queue that owns a customer's writes"""
+        return self._queues[zlib.crc32(customer_id.encode()) % len(self._queues)]
+
+    def _worker(self, work_queue: queue.Queue) -> None:
+        """Drain one queue into the backend"""
+        while True:
+            task = work_queue.get()
+            if task is None:
+                work_queue.task_done()
+                return
+
+            customer_id, items = task
+            try:
+                stored = self.backend.store_memories(customer_id, items)
+            except Exception as e:
+                print(f"Error writing queued memories: {e}")
+                stored = False
+
+            with self._condition:
+                self._metrics["written" if stored else "failed"] += len(items)
+                self._pending[customer_id] -= 1
+                if not self._pending[customer_id]:
+                    del self._pending[customer_id]
+                self._condition.notify_all()
+            work_queue.task_done()
+
+    def _wait_for_customer(self, customer_id: str) -> bool:
+        """Block until a customer's queued writes have reached the backend"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: customer_id not in self._pending, timeout=self.flush_timeout
+            )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for every queued write; returns False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending, timeout=timeout)
+
+    def close(self) -> None:
+        """Flush queued writes, stop the workers and close the backend"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.wait_for(lambda: not self._enqueuing, timeout=self.flush_timeout)
+        self.flush(self.flush_timeout)
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for worker in self._workers:
+            worker.join(self.flush_timeout)
+        self.backend.close()
+        atexit.unregister(self.close)
+
+    def get_metrics(self) -> Dict[str, int]:
+        """Queue depth plus counts of enqueued, written, dropped and failed memories"""
+        with self._condition:
+            return {
+                **self._metrics,
+                "queue_depth": sum(work_queue.qsize() for work_queue in self._queues),
+                "pending_customers": len(self._pending)
+            }
+
+    def create_memory_namespace(self, customer_id: str) -> bool:
+        """Create a namespace on the backend"""
+        return self.backend.create_memory_namespace(customer_id)
+
+    def invalidate_namespace(self, customer_id: Optional[str] = None) -> None:
+        """Forget cached namespaces on the backend"""
+        self.backend.invalidate_namespace(customer_id)
+
+    def warm_namespace_cache(self, page_size: int = 1000) -> int:
+        """Seed the backend namespace cache from a bulk listing"""
+        return self.backend.warm_namespace_cache(page_size)
+
+    def store_memory(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Queue a single memory for storage"""
+        return self.store_memories(
+            customer_id, [{"content": content, "memory_type": memory_type, "metadata": metadata}]
+        )
+
+    def store_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Queue memories for storage; False if they were dropped (queue full or writer closed)"""
+        if not items:
+            return True
+
+        # The closed check and the in-flight count share close()'s lock
+        with self._condition:
+            closed = self._closed
+            if not closed:
+                self._pending[customer_id] = self._pending.get(customer_id, 0) + 1
+                self._enqueuing += 1
+        if closed:
+            # close() has already closed the backend, so there is nowhere to write
+            print(f"Memory writer is closed, dropped {len(items)} memories for {customer_id}")
+            with self._condition:
+                self._metrics["dropped"] += len(items)
+            return False
+
+        try:
+            self._shard(customer_id).put((customer_id, items), timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._condition:
+                self._enqueuing -= 1
+                self._metrics["dropped"] += len(items)
+                self._pending[customer_id] -= 1
+                if not self._pending[customer_id]:
+                    del self._pending[customer_id]
+                self._condition.notify_all()
+            print(f"Memory write queue full, dropped {len(items)} memories for {customer_id}")
+            return False
+
+        with self._condition:
+            self._enqueuing -= 1
+            self._metrics["enqueued"] += len(items)
+            self._condition.notify_all()
+        return True
+
+    def retrieve_memories(
+        self,
+        customer_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Retrieve memories after the customer's queued writes land"""
+        self._wait_for_customer(customer_id)
+        return self.backend.retrieve_memories(customer_id, query, limit, memory_type)
+
+    def get_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get all memories after the customer's queued writes land"""
+        self._wait_for_customer(customer_id)
+        return self.backend.get_all_memories(customer_id, limit)
+
+    def delete_memory(self, customer_id: str, memory_id: str) -> bool:
+        """Delete a memory after the customer's queued writes land"""
+        self._wait_for_customer(customer_id)
+        return self.backend.delete_memory(customer_id, memory_id)
+
+    def update_memory(
+        self,
+        customer_id: str,
+        memory_id: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Update a memory after the customer's queued writes land"""
+        self._wait_for_customer(customer_id)
+        return self.backend.update_memory(customer_id, memory_id, content, metadata)
+
+    # Async API - queue operations and waits run off the event loop
+
+    async def acreate_memory_namespace(self, customer_id: str) -> bool:
+        """Async variant of create_memory_namespace"""
+        return await self.backend.acreate_memory_namespace(customer_id)
+
+    async def astore_memory(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of store_memory"""
+        return await asyncio.to_thread(self.store_memory, customer_id, content, memory_type, metadata)
+
+    async def astore_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Async variant of store_memories"""
+        return await asyncio.to_thread(self.store_memories, customer_id, items)
+
+    async def aretrieve_memories(
+        self,
+        customer_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of retrieve_memories"""
+        await asyncio.to_thread(self._wait_for_customer, customer_id)
+        return await self.backend.aretrieve_memories(customer_id, query, limit, memory_type)
+
+    async def aget_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Async variant of get_all_memories"""
+        await asyncio.to_thread(self._wait_for_customer, customer_id)
+        return await self.backend.aget_all_memories(customer_id, limit)
+
+    async def adelete_memory(self, customer_id: str, memory_id: str) -> bool:
+        """Async variant of delete_memory"""
+        await asyncio.to_thread(self._wait_for_customer, customer_id)
+        return await self.backend.adelete_memory(customer_id, memory_id)
+
+    async def aupdate_memory(
+        self,
+        customer_id: str,
+        memory_id: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of update_memory"""
+        await asyncio.to_thread(self._wait_for_customer, customer_id)
+        return await self.backend.aupdate_memory(customer_id, memory_id, content, metadata)
+
+    async def aclose(self) -> None:
+        """Flush and stop the workers, then release backend async resources"""
+        await asyncio.to_thread(self.close)
+        await self.backend.aclose()
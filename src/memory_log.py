@@ -0,0 +1,291 @@
+"""
+Append-only on-disk log backing LocalMemoryManager's durable mode
+
+Every memory operation is appended to a JSONL log. A fixed-width binary
+index (customer hash, byte offset, op code) is appended alongside it. At
+startup both files are memory-mapped and nothing is replayed: a customer's
+records are located with one vectorized scan of the index the first time
+that customer is touched. fsyncs are batched by time, and compact() rewrites
+the live memories into a new snapshot generation so superseded updates and
+deletes stop costing disk and load time.
+
+Layout of a storage directory:
+    CURRENT              generation number of the active files
+    memories-<gen>.log   JSONL records
+    memories-<gen>.idx   index records matching INDEX_DTYPE
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+OP_NAMESPACE = 0
+OP_STORE = 1
+OP_UPDATE = 2
+OP_DELETE = 3
+OP_CODES = {"namespace": OP_NAMESPACE, "store": OP_STORE, "update": OP_UPDATE, "delete": OP_DELETE}
+
+INDEX_DTYPE = np.dtype([("customer", "<u8"), ("offset", "<u8"), ("op", "u1")])
+
+
+def customer_hash(customer_id: str) -> int:
+    """Stable 64-bit key for a customer id"""
+    return int.from_bytes(hashlib.blake2b(customer_id.encode(), digest_size=8).digest(), "little")
+
+
+def _map_file(path: str) -> Optional[mmap.mmap]:
+    """Read-only mmap of a file, or None when it is empty"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MemoryLog:
+    """Append-only memory log with an mmap'd per-record offset index"""
+
+    # Bytes read per step when scanning backwards for the last newline
+    REPAIR_CHUNK = 64 * 1024
+    # Re-indexed entries written per batch
+    REPAIR_BATCH = 10000
+
+    def __init__(self, directory: str, fsync_interval: float = 1.0):
+        """Open (or create) the log in directory"""
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        current_path = os.path.join(directory, "CURRENT")
+        if os.path.exists(current_path):
+            with open(current_path) as f:
+                self.generation = int(f.read().strip())
+        else:
+            self.generation = 0
+            self._write_current(0)
+        self._open_generation()
+
+    def _paths(self, generation: int):
+        """Log and index paths for a generation"""
+        return (
+            os.path.join(self.directory, f"memories-{generation}.log"),
+            os.path.join(self.directory, f"memories-{generation}.idx"),
+        )
+
+    def _write_current(self, generation: int) -> None:
+        """Atomically point CURRENT at a generation"""
+        temp_path = os.path.join(self.directory, "CURRENT.tmp")
+        with open(temp_path, "w") as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, os.path.join(self.directory, "CURRENT"))
+
+    def _repair(self, log_path: str, index_path: str) -> None:
+        """Bring the log and index back in line after a crash mid-append
+
+        A torn log line is cut back to the last newline, a partial index record
+        is dropped, index entries pointing past the log are discarded and
+        complete log lines that never got an index entry are re-indexed. Only
+        the tail after the last valid index entry is read, never the whole log.
+        """
+        if not os.path.exists(log_path):
+            open(log_path, "ab").close()
+        if not os.path.exists(index_path):
+            open(index_path, "ab").close()
+
+        with open(log_path, "rb+") as log, open(index_path, "rb+") as index:
+            # Cut a torn log tail back to the last newline
+            log_size = log.seek(0, os.SEEK_END)
+            log_end = 0
+            position = log_size
+            while position > 0:
+                step = min(self.REPAIR_CHUNK, position)
+                position -= step
+                log.seek(position)
+                newline = log.read(step).rfind(b"\n")
+                if newline != -1:
+                    log_end = position + newline + 1
+                    break
+            if log_end != log_size:
+                print(f"[MEMORY LOG] Dropping {log_size - log_end} bytes of torn log tail")
+                log.truncate(log_end)
+
+            # Drop a partial index record and entries that do not start a complete line
+            index_size = index.seek(0, os.SEEK_END)
+            valid = index_size // INDEX_DTYPE.itemsize
+            last_offset = None
+            while valid:
+                index.seek((valid - 1) * INDEX_DTYPE.itemsize)
+                offset = int(np.frombuffer(index.read(INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)["offset"][0])
+                if offset < log_end:
+                    log.seek(max(offset - 1, 0))
+                    if offset == 0 or log.read(1) == b"\n":
+                        last_offset = offset
+                        break
+                valid -= 1
+            if valid * INDEX_DTYPE.itemsize != index_size:
+                print(f"[MEMORY LOG] Truncating index from {index_size} to {valid * INDEX_DTYPE.itemsize} bytes")
+                index.truncate(valid * INDEX_DTYPE.itemsize)
+
+            # Re-index log lines written after the last surviving index entry
+            log.seek(0 if last_offset is None else last_offset)
+            if last_offset is not None:
+                log.readline()
+            index.seek(valid * INDEX_DTYPE.itemsize)
+            missing, reindexed = [], 0
+            start = log.tell()
+            while start < log_end:
+                line = log.readline()
+                try:
+                    record = json.loads(line)
+                    missing.append((customer_hash(record["customer_id"]), start, OP_CODES[record["op"]]))
+                except (ValueError, KeyError):
+                    pass
+                start += len(line)
+                if len(missing) >= self.REPAIR_BATCH or (missing and start >= log_end):
+                    index.write(np.array(missing, dtype=INDEX_DTYPE).tobytes())
+                    reindexed += len(missing)
+                    missing = []
+            if reindexed:
+                print(f"[MEMORY LOG] Re-indexed {reindexed} unindexed log records")
+
+    def _open_generation(self) -> None:
+        """Map the existing records and open the files for appending"""
+        log_path, index_path = self._paths(self.generation)
+        self._repair(log_path, index_path)
+        self._log_map = _map_file(log_path)
+        self._index_map = _map_file(index_path)
+        self._index = (
+            np.frombuffer(self._index_map, dtype=INDEX_DTYPE, count=len(self._index_map) // INDEX_DTYPE.itemsize)
+            if self._index_map is not None else np.empty(0, dtype=INDEX_DTYPE)
+        )
+        self._log_file = open(log_path, "ab")
+        self._index_file = open(index_path, "ab")
+        self._log_size = self._log_file.tell()
+        self._last_sync = time.monotonic()
+
+    def _close_generation(self) -> None:
+        """Flush and close the active files and maps"""
+        self._sync()
+        self._log_file.close()
+        self._index_file.close()
+        self._index = np.empty(0, dtype=INDEX_DTYPE)
+        for mapped in (self._log_map, self._index_map):
+            if mapped is not None:
+                mapped.close()
+        self._log_map = self._index_map = None
+
+    def _sync(self) -> None:
+        """Flush buffers and fsync both files"""
+        for f in (self._log_file, self._index_file):
+            f.flush()
+            os.fsync(f.fileno())
+        self._last_sync = time.monotonic()
+
+    def _append_unlocked(self, record: Dict[str, Any]) -> None:
+        """Write one record and its index entry"""
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        entry = np.array(
+            [(customer_hash(record["customer_id"]), self._log_size, OP_CODES[record["op"]])],
+            dtype=INDEX_DTYPE
+        )
+        self._log_file.write(line)
+        self._index_file.write(entry.tobytes())
+        self._log_size += len(line)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append a record; hand it to the OS now, fsync at most once per fsync_interval"""
+        with self._lock:
+            self._append_unlocked(record)
+            self._log_file.flush()
+            self._index_file.flush()
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def flush(self) -> None:
+        """Force pending records to disk"""
+        with self._lock:
+            self._sync()
+
+    def garbage_count(self) -> int:
+        """Superseding records (updates and deletes) in the mapped generation"""
+        return int(np.count_nonzero(self._index["op"] >= OP_UPDATE))
+
+    def records_for(self, customer_id: str) -> Iterator[Dict[str, Any]]:
+        """Records for one customer that existed when the generation was opened"""
+        if self._log_map is None or not len(self._index):
+            return
+        offsets = self._index["offset"][self._index["customer"] == customer_hash(customer_id)]
+        for offset in offsets.tolist():
+            end = self._log_map.find(b"\n", offset)
+            if end == -1:
+                break  # truncated tail from a crash before fsync
+            try:
+                record = json.loads(self._log_map[offset:end])
+            except ValueError:
+                continue
+            if record.get("customer_id") == customer_id:
+                yield record
+
+    def customer_ids(self) -> List[str]:
+        """Every customer with records in the mapped generation"""
+        if self._log_map is None or not len(self._index):
+            return []
+        _, first = np.unique(self._index["customer"], return_index=True)
+        customer_ids = []
+        for offset in self._index["offset"][np.sort(first)].tolist():
+            end = self._log_map.find(b"\n", offset)
+            try:
+                customer_ids.append(json.loads(self._log_map[offset:end])["customer_id"])
+            except (ValueError, KeyError):
+                continue
+        return customer_ids
+
+    def compact(self, memories: Dict[str, List[Dict[str, Any]]], next_ids: Dict[str, int]) -> None:
+        """Write live memories as a new snapshot generation and drop the old one
+
+        Records are grouped per customer so later lazy loads read contiguous bytes.
+        """
+        with self._lock:
+            old_generation = self.generation
+            self._close_generation()
+
+            self.generation = old_generation + 1
+            log_path, index_path = self._paths(self.generation)
+            for path in (log_path, index_path):
+                if os.path.exists(path):
+                    os.remove(path)  # leftover from an interrupted compaction
+            self._log_file = open(log_path, "ab")
+            self._index_file = open(index_path, "ab")
+            self._log_size = 0
+            for customer_id, entries in memories.items():
+                self._append_unlocked({
+                    "op": "namespace", "customer_id": customer_id, "next_id": next_ids.get(customer_id, 0)
+                })
+                for entry in entries:
+                    self._append_unlocked({"op": "store", "customer_id": customer_id, "memory": entry})
+            self._log_file.close()
+            self._index_file.close()
+
+            # Durable switch: files are complete before CURRENT points at them
+            for path in (log_path, index_path):
+                with open(path, "rb") as f:
+                    os.fsync(f.fileno())
+            self._write_current(self.generation)
+            for path in self._paths(old_generation):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._open_generation()
+
+    def close(self) -> None:
+        """Flush and close the log"""
+        with self._lock:
+            if not self._log_file.closed:
+                self._close_generation()
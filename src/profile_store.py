@@ -0,0 +1,354 @@
+"""
+Profile repositories for ProfileBuilder
+
+InMemoryProfileRepository keeps profiles in a dict (the original behaviour).
+SQLiteProfileRepository persists them in SQLite (WAL mode). Scalar fields
+live in indexed columns and list fields in JSON columns; tags and service
+interests are mirrored into indexed side tables, so segment queries run as
+one indexed WHERE and see writes from other processes.
+
+ProfileIndex holds in-process secondary indexes (tag, industry, sentiment,
+service interest -> customer ids, plus a sorted project value index) for the
+in-memory repository, so its segment queries touch only the matching ids.
+"""
+import bisect
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from profiles import CustomerProfile
+
+
+class InMemoryProfileRepository:
+    """Dict-backed profile repository"""
+
+    def __init__(self):
+        """Initialize in-memory profile storage"""
+        self.profiles: Dict[str, CustomerProfile] = {}
+
+    def get(self, customer_id: str) -> Optional[CustomerProfile]:
+        """Get a profile by customer id"""
+        return self.profiles.get(customer_id)
+
+    def save(self, profile: CustomerProfile) -> None:
+        """Insert or replace a profile"""
+        self.profiles[profile.customer_id] = profile
+
+    def __contains__(self, customer_id: str) -> bool:
+        return customer_id in self.profiles
+
+    def __iter__(self) -> Iterator[CustomerProfile]:
+        return iter(list(self.profiles.values()))
+
+    def as_dict(self) -> Dict[str, CustomerProfile]:
+        """The live profile dict"""
+        return self.profiles
+
+    def get_many(self, customer_ids: Iterable[str]) -> List[CustomerProfile]:
+        """Get the profiles that exist for several customer ids"""
+        return [self.profiles[cid] for cid in customer_ids if cid in self.profiles]
+
+    def close(self) -> None:
+        """Nothing to release for in-memory storage"""
+        return None
+
+
+class SQLiteProfileRepository:
+    """SQLite-backed profile repository (WAL mode, indexed scalar columns)"""
+
+    # Stay under SQLite's bound-parameter limit for IN (...) lookups
+    SQL_BATCH_SIZE = 900
+
+    # Stored as JSON text
+    JSON_FIELDS = (
+        "preferences", "project_history", "proposed_projects", "scheduled_meetings",
+        "issues_reported", "tags", "service_interests", "key_requirements",
+    )
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            customer_id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT,
+            phone TEXT,
+            company TEXT COLLATE NOCASE,
+            company_type TEXT,
+            industry TEXT COLLATE NOCASE,
+            sentiment_trend TEXT NOT NULL DEFAULT 'neutral',
+            last_interaction_summary TEXT NOT NULL DEFAULT '',
+            interaction_count INTEGER NOT NULL DEFAULT 0,
+            project_value REAL NOT NULL DEFAULT 0,
+            estimated_budget TEXT,
+            decision_timeline TEXT,
+            created_at TEXT NOT NULL DEFAULT '',
+            updated_at TEXT NOT NULL DEFAULT '',
+            preferences TEXT NOT NULL DEFAULT '[]',
+            project_history TEXT NOT NULL DEFAULT '[]',
+            proposed_projects TEXT NOT NULL DEFAULT '[]',
+            scheduled_meetings TEXT NOT NULL DEFAULT '[]',
+            issues_reported TEXT NOT NULL DEFAULT '[]',
+            tags TEXT NOT NULL DEFAULT '[]',
+            service_interests TEXT NOT NULL DEFAULT '[]',
+            key_requirements TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE INDEX IF NOT EXISTS idx_profiles_industry_sentiment ON profiles (industry, sentiment_trend);
+        CREATE INDEX IF NOT EXISTS idx_profiles_sentiment ON profiles (sentiment_trend);
+        CREATE INDEX IF NOT EXISTS idx_profiles_project_value ON profiles (project_value);
+        CREATE INDEX IF NOT EXISTS idx_profiles_company ON profiles (company);
+        CREATE TABLE IF NOT EXISTS profile_tags (
+            customer_id TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (tag, customer_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_profile_tags_customer ON profile_tags (customer_id);
+        CREATE TABLE IF NOT EXISTS profile_services (
+            customer_id TEXT NOT NULL,
+            service TEXT NOT NULL,
+            PRIMARY KEY (service, customer_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_profile_services_customer ON profile_services (customer_id);
+    """
+
+    # List field -> (side table, value column) kept in step with it on every save
+    SIDE_TABLES = {"tags": ("profile_tags", "tag"), "service_interests": ("profile_services", "service")}
+
+    def __init__(self, path: str):
+        """Open (or create) the profile database at path"""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._backfill_side_tables()
+        self._columns = list(CustomerProfile.model_fields)
+        self._upsert_sql = (
+            f"INSERT OR REPLACE INTO profiles ({', '.join(self._columns)}) "
+            f"VALUES ({', '.join('?' for _ in self._columns)})"
+        )
+
+    def _backfill_side_tables(self) -> None:
+        """Populate side tables for databases written before they existed"""
+        with self._lock, self._conn:
+            for field, (table, column) in self.SIDE_TABLES.items():
+                if self._conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None:
+                    self._conn.execute(
+                        f"INSERT OR IGNORE INTO {table} (customer_id, {column}) "
+                        f"SELECT p.customer_id, j.value FROM profiles p, json_each(p.{field}) j"
+                    )
+
+    def _to_row(self, profile: CustomerProfile) -> List[Any]:
+        """Column values for a profile"""
+        data = profile.model_dump()
+        return [
+            json.dumps(data[column]) if column in self.JSON_FIELDS else data[column]
+            for column in self._columns
+        ]
+
+    def _from_row(self, row: sqlite3.Row) -> CustomerProfile:
+        """Profile for a result row"""
+        data = dict(row)
+        for column in self.JSON_FIELDS:
+            data[column] = json.loads(data[column])
+        return CustomerProfile(**data)
+
+    def _select(self, where: str = "", params: tuple = ()) -> List[CustomerProfile]:
+        """Run a SELECT over profiles"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM profiles {where}", params).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def get(self, customer_id: str) -> Optional[CustomerProfile]:
+        """Get a profile by customer id"""
+        profiles = self._select("WHERE customer_id = ?", (customer_id,))
+        return profiles[0] if profiles else None
+
+    def save(self, profile: CustomerProfile) -> None:
+        """Insert or replace a profile"""
+        row = self._to_row(profile)
+        with self._lock, self._conn:
+            self._conn.execute(self._upsert_sql, row)
+            for field, (table, column) in self.SIDE_TABLES.items():
+                self._conn.execute(f"DELETE FROM {table} WHERE customer_id = ?", (profile.customer_id,))
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} (customer_id, {column}) VALUES (?, ?)",
+                    [(profile.customer_id, value) for value in getattr(profile, field)]
+                )
+
+    def __contains__(self, customer_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM profiles WHERE customer_id = ?", (customer_id,)
+            ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[CustomerProfile]:
+        return iter(self._select())
+
+    def as_dict(self) -> Dict[str, CustomerProfile]:
+        """Snapshot of every profile keyed by customer id (loads the whole table)"""
+        return {profile.customer_id: profile for profile in self._select()}
+
+    def get_many(self, customer_ids: Iterable[str]) -> List[CustomerProfile]:
+        """Get the profiles that exist for several customer ids"""
+        customer_ids = list(customer_ids)
+        found = {}
+        for start in range(0, len(customer_ids), self.SQL_BATCH_SIZE):
+            chunk = customer_ids[start:start + self.SQL_BATCH_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            for profile in self._select(f"WHERE customer_id IN ({placeholders})", tuple(chunk)):
+                found[profile.customer_id] = profile
+        return [found[cid] for cid in customer_ids if cid in found]
+
+    def query(
+        self,
+        tags: Optional[List[str]] = None,
+        industry: Optional[str] = None,
+        sentiment: Optional[str] = None,
+        service_interests: Optional[List[str]] = None,
+        min_project_value: Optional[float] = None,
+        max_project_value: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[CustomerProfile]:
+        """Profiles matching every given filter (all tags, all service interests),
+        answered from the column and side-table indexes"""
+        clauses, params = [], []
+        for field, values in (("tags", tags), ("service_interests", service_interests)):
+            table, column = self.SIDE_TABLES[field]
+            for value in values or []:
+                clauses.append(f"customer_id IN (SELECT customer_id FROM {table} WHERE {column} = ?)")
+                params.append(value)
+        if industry is not None:
+            clauses.append("industry = ?")
+            params.append(industry)
+        if sentiment is not None:
+            clauses.append("sentiment_trend = ?")
+            params.append(sentiment)
+        if min_project_value is not None:
+            clauses.append("project_value >= ?")
+            params.append(min_project_value)
+        if max_project_value is not None:
+            clauses.append("project_value <= ?")
+            params.append(max_project_value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        where += " ORDER BY customer_id"
+        if limit is not None:
+            where += " LIMIT ?"
+            params.append(limit)
+        return self._select(where, tuple(params))
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+class ProfileIndex:
+    """In-process secondary indexes over profiles for cross-client segment queries"""
+
+    def __init__(self):
+        """Initialize empty indexes"""
+        self.by_tag: Dict[str, Set[str]] = {}
+        self.by_industry: Dict[str, Set[str]] = {}
+        self.by_sentiment: Dict[str, Set[str]] = {}
+        self.by_service: Dict[str, Set[str]] = {}
+        self.values: Dict[str, float] = {}
+        self._sorted_values: List[Tuple[float, str]] = []
+        self._keys: Dict[str, Tuple[frozenset, Optional[str], str, frozenset]] = {}
+
+    @staticmethod
+    def _add(index: Dict[str, Set[str]], key: str, customer_id: str) -> None:
+        index.setdefault(key, set()).add(customer_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, customer_id: str) -> None:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(customer_id)
+            if not ids:
+                del index[key]
+
+    def update(self, profile: CustomerProfile) -> None:
+        """Re-index one profile, touching only the keys that changed"""
+        customer_id = profile.customer_id
+        keys = (
+            frozenset(profile.tags),
+            profile.industry.lower() if profile.industry else None,
+            profile.sentiment_trend,
+            frozenset(profile.service_interests),
+        )
+        old = self._keys.get(customer_id)
+        if old != keys:
+            old_tags, old_industry, old_sentiment, old_services = old or (frozenset(), None, None, frozenset())
+            for tag in old_tags - keys[0]:
+                self._discard(self.by_tag, tag, customer_id)
+            for tag in keys[0] - old_tags:
+                self._add(self.by_tag, tag, customer_id)
+            if old_industry != keys[1]:
+                if old_industry is not None:
+                    self._discard(self.by_industry, old_industry, customer_id)
+                if keys[1] is not None:
+                    self._add(self.by_industry, keys[1], customer_id)
+            if old_sentiment != keys[2]:
+                if old_sentiment is not None:
+                    self._discard(self.by_sentiment, old_sentiment, customer_id)
+                self._add(self.by_sentiment, keys[2], customer_id)
+            for service in old_services - keys[3]:
+                self._discard(self.by_service, service, customer_id)
+            for service in keys[3] - old_services:
+                self._add(self.by_service, service, customer_id)
+            self._keys[customer_id] = keys
+
+        value = profile.project_value
+        old_value = self.values.get(customer_id)
+        if old_value != value:
+            if old_value is not None:
+                position = bisect.bisect_left(self._sorted_values, (old_value, customer_id))
+                del self._sorted_values[position]
+            bisect.insort(self._sorted_values, (value, customer_id))
+            self.values[customer_id] = value
+
+    def value_range(self, min_value: Optional[float], max_value: Optional[float]) -> Set[str]:
+        """Customer ids whose project value lies in [min_value, max_value]"""
+        start = 0 if min_value is None else bisect.bisect_left(self._sorted_values, (min_value, ""))
+        end = (
+            len(self._sorted_values) if max_value is None
+            else bisect.bisect_right(self._sorted_values, (max_value, "\U0010ffff"))
+        )
+        return {customer_id for _, customer_id in self._sorted_values[start:end]}
+
+    def search(
+        self,
+        tags: Optional[List[str]] = None,
+        industry: Optional[str] = None,
+        sentiment: Optional[str] = None,
+        service_interests: Optional[List[str]] = None,
+        min_project_value: Optional[float] = None,
+        max_project_value: Optional[float] = None
+    ) -> List[str]:
+        """Customer ids matching every given filter (all tags, all service interests)"""
+        candidates = [self.by_tag.get(tag, set()) for tag in tags or []]
+        candidates += [self.by_service.get(service, set()) for service in service_interests or []]
+        if industry is not None:
+            candidates.append(self.by_industry.get(industry.lower(), set()))
+        if sentiment is not None:
+            candidates.append(self.by_sentiment.get(sentiment, set()))
+
+        has_range = min_project_value is not None or max_project_value is not None
+        if not candidates:
+            ids = self.value_range(min_project_value, max_project_value) if has_range else set(self.values)
+            return sorted(ids)
+
+        # Intersect smallest-first so the work is bounded by the rarest filter
+        candidates.sort(key=len)
+        ids = set(candidates[0])
+        for other in candidates[1:]:
+            if not ids:
+                break
+            ids &= other
+        if has_range:
+            low = float("-inf") if min_project_value is None else min_project_value
+            high = float("inf") if max_project_value is None else max_project_value
+            ids = {cid for cid in ids if low <= self.values[cid] <= high}
+        return sorted(ids)
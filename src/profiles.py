@@ -9,10 +9,13 @@ Manages client profiles for Vanco AI enterprise customers including:
 - Generative AI implementations
 """
 import json
+import threading
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
+from utils import LockStripes
+
 
 class CustomerProfile(BaseModel):
     """Enterprise Client Profile for Vanco AI"""
@@ -79,9 +82,61 @@ class ProfileBuilder:
         "Telecommunications"
     ]
 
-    def __init__(self):
-        """Initialize profile builder for Vanco AI clients"""
-        self.profiles: Dict[str, CustomerProfile] = {}
+    def __init__(self, repository=None):
+        """Initialize profile builder for Vanco AI clients
+
+        Args:
+            repository: Profile storage; defaults to an in-memory repository.
+                Pass a SQLiteProfileRepository to persist profiles.
+        """
+        if repository is None:
+            from profile_store import InMemoryProfileRepository
+            repository = InMemoryProfileRepository()
+        self.repository = repository
+        # Secondary indexes for query() on repositories without their own; built on first use
+        self._index = None
+        self._index_lock = threading.Lock()
+        # Per-customer stripes serialize read-modify-write of a profile and its cache fills
+        self._locks = LockStripes()
+        # Rendered summaries and exports, dropped when a profile is marked dirty
+        self._summary_cache: Dict[str, str] = {}
+        self._export_cache: Dict[str, Dict[str, Any]] = {}
+        # Bumped on every change, so callers can key their own caches on it
+        self._versions: Dict[str, int] = {}
+
+    @property
+    def profiles(self) -> Dict[str, CustomerProfile]:
+        """All profiles keyed by customer id"""
+        return self.repository.as_dict()
+
+    def _mark_dirty(self, customer_id: str) -> None:
+        """Invalidate cached renderings of a profile"""
+        self._summary_cache.pop(customer_id, None)
+        self._export_cache.pop(customer_id, None)
+        self._versions[customer_id] = self._versions.get(customer_id, 0) + 1
+
+    def profile_version(self, customer_id: str) -> int:
+        """Change counter for a profile (0 until it is first saved in this process)"""
+        return self._versions.get(customer_id, 0)
+
+    def _save(self, profile: CustomerProfile) -> None:
+        """Persist a profile, mark it dirty and keep the query indexes current"""
+        self.repository.save(profile)
+        self._mark_dirty(profile.customer_id)
+        with self._index_lock:
+            if self._index is not None:
+                self._index.update(profile)
+
+    def _ensure_index(self):
+        """Build the secondary indexes from the repository once"""
+        with self._index_lock:
+            if self._index is None:
+                from profile_store import ProfileIndex
+                index = ProfileIndex()
+                for profile in self.repository:
+                    index.update(profile)
+                self._index = index
+            return self._index
 
     def create_profile(
         self,
@@ -92,31 +147,89 @@ class ProfileBuilder:
         industry: Optional[str] = None
     ) -> CustomerProfile:
         """Create a new enterprise client profile"""
-        profile = CustomerProfile(
-            customer_id=customer_id,
-            name=name,
-            email=email,
-            company=company,
-            industry=industry,
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
-        )
-        self.profiles[customer_id] = profile
-        return profile
+        with self._locks.for_key(customer_id):
+            profile = CustomerProfile(
+                customer_id=customer_id,
+                name=name,
+                email=email,
+                company=company,
+                industry=industry,
+                created_at=datetime.now().isoformat(),
+                updated_at=datetime.now().isoformat()
+            )
+            self._save(profile)
+            return profile
 
     def get_profile(self, customer_id: str) -> Optional[CustomerProfile]:
         """Get existing profile or create new one"""
-        return self.profiles.get(customer_id)
+        return self.repository.get(customer_id)
+
+    def get_or_create_profile(self, customer_id: str, name: str) -> CustomerProfile:
+        """Get a profile, creating it atomically when the customer is new"""
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                profile = self.create_profile(customer_id=customer_id, name=name)
+            return profile
+
+    def query(
+        self,
+        tags: Optional[List[str]] = None,
+        industry: Optional[str] = None,
+        sentiment: Optional[str] = None,
+        service_interests: Optional[List[str]] = None,
+        min_project_value: Optional[float] = None,
+        max_project_value: Optional[float] = None,
+        limit: Optional[int] = None
+    ) -> List[CustomerProfile]:
+        """Find client profiles matching every given filter
+
+        e.g. query(tags=["high_priority"], industry="Healthcare", sentiment="negative")
+        """
+        if isinstance(tags, str):
+            tags = [tags]
+        if isinstance(service_interests, str):
+            service_interests = [service_interests]
+        if hasattr(self.repository, "query"):
+            # Repositories with their own indexes (SQLite) answer in the database
+            return self.repository.query(
+                tags=tags,
+                industry=industry,
+                sentiment=sentiment,
+                service_interests=service_interests,
+                min_project_value=min_project_value,
+                max_project_value=max_project_value,
+                limit=limit
+            )
+        index = self._ensure_index()
+        with self._index_lock:
+            customer_ids = index.search(
+                tags=tags,
+                industry=industry,
+                sentiment=sentiment,
+                service_interests=service_interests,
+                min_project_value=min_project_value,
+                max_project_value=max_project_value
+            )
+        if limit is not None:
+            customer_ids = customer_ids[:limit]
+        return self.repository.get_many(customer_ids)
+
+    def close(self) -> None:
+        """Release the profile repository"""
+        self.repository.close()
 
     def update_preferences(self, customer_id: str, preferences: List[str]) -> bool:
         """Update customer preferences"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        profile.preferences = list(set(profile.preferences + preferences))
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            profile.preferences = list(set(profile.preferences + preferences))
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def add_project(
         self,
@@ -128,22 +241,24 @@ class ProfileBuilder:
         details: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Add AI project to client history"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        project = {
-            "project_name": project_name,
-            "value": value,
-            "service_category": service_category,
-            "status": status,
-            "date": datetime.now().isoformat(),
-            "details": details or {}
-        }
-        profile.project_history.append(project)
-        profile.project_value += value
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            project = {
+                "project_name": project_name,
+                "value": value,
+                "service_category": service_category,
+                "status": status,
+                "date": datetime.now().isoformat(),
+                "details": details or {}
+            }
+            profile.project_history.append(project)
+            profile.project_value += value
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     # Legacy method for backward compatibility
     def add_purchase(
@@ -165,18 +280,20 @@ class ProfileBuilder:
         industry: Optional[str] = None
     ) -> bool:
         """Update company information for client"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        if company:
-            profile.company = company
-        if company_type:
-            profile.company_type = company_type
-        if industry:
-            profile.industry = industry
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            if company:
+                profile.company = company
+            if company_type:
+                profile.company_type = company_type
+            if industry:
+                profile.industry = industry
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def add_scheduled_meeting(
         self,
@@ -187,21 +304,23 @@ class ProfileBuilder:
         details: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Add a scheduled meeting to client profile"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        meeting = {
-            "date": meeting_date,
-            "time": meeting_time,
-            "purpose": purpose,
-            "status": "scheduled",
-            "created_at": datetime.now().isoformat(),
-            "details": details or {}
-        }
-        profile.scheduled_meetings.append(meeting)
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            meeting = {
+                "date": meeting_date,
+                "time": meeting_time,
+                "purpose": purpose,
+                "status": "scheduled",
+                "created_at": datetime.now().isoformat(),
+                "details": details or {}
+            }
+            profile.scheduled_meetings.append(meeting)
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def add_proposed_project(
         self,
@@ -213,43 +332,49 @@ class ProfileBuilder:
         details: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Add a proposed/discussed project to client profile"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        project = {
-            "project_name": project_name,
-            "project_type": project_type,
-            "description": description,
-            "estimated_value": estimated_value,
-            "status": "proposed",
-            "created_at": datetime.now().isoformat(),
-            "details": details or {}
-        }
-        profile.proposed_projects.append(project)
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            project = {
+                "project_name": project_name,
+                "project_type": project_type,
+                "description": description,
+                "estimated_value": estimated_value,
+                "status": "proposed",
+                "created_at": datetime.now().isoformat(),
+                "details": details or {}
+            }
+            profile.proposed_projects.append(project)
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def update_service_interests(self, customer_id: str, services: List[str]) -> bool:
         """Update client service interests"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        profile.service_interests = list(set(profile.service_interests + services))
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            profile.service_interests = list(set(profile.service_interests + services))
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def add_key_requirement(self, customer_id: str, requirement: str) -> bool:
         """Add a key requirement mentioned by client"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        if requirement not in profile.key_requirements:
-            profile.key_requirements.append(requirement)
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            if requirement not in profile.key_requirements:
+                profile.key_requirements.append(requirement)
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def update_contact_info(
         self,
@@ -258,16 +383,18 @@ class ProfileBuilder:
         phone: Optional[str] = None
     ) -> bool:
         """Update client contact information"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        if email:
-            profile.email = email
-        if phone:
-            profile.phone = phone
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            if email:
+                profile.email = email
+            if phone:
+                profile.phone = phone
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def add_issue(
         self,
@@ -278,67 +405,85 @@ class ProfileBuilder:
         resolution: Optional[str] = None
     ) -> bool:
         """Add reported issue to profile"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        issue = {
-            "description": issue_description,
-            "category": category,
-            "severity": severity,
-            "resolution": resolution,
-            "date": datetime.now().isoformat(),
-            "resolved": resolution is not None
-        }
-        profile.issues_reported.append(issue)
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            issue = {
+                "description": issue_description,
+                "category": category,
+                "severity": severity,
+                "resolution": resolution,
+                "date": datetime.now().isoformat(),
+                "resolved": resolution is not None
+            }
+            profile.issues_reported.append(issue)
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def update_sentiment(self, customer_id: str, sentiment: str) -> bool:
         """Update customer sentiment trend"""
-        if customer_id not in self.profiles:
-            return False
-
         valid_sentiments = ["positive", "neutral", "negative"]
         if sentiment not in valid_sentiments:
             return False
 
-        profile = self.profiles[customer_id]
-        profile.sentiment_trend = sentiment
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            profile.sentiment_trend = sentiment
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def update_last_interaction(self, customer_id: str, summary: str) -> bool:
         """Update last interaction summary"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        profile.last_interaction_summary = summary
-        profile.interaction_count += 1
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            profile.last_interaction_summary = summary
+            profile.interaction_count += 1
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def add_tag(self, customer_id: str, tag: str) -> bool:
         """Add tag to customer profile"""
-        if customer_id not in self.profiles:
-            return False
-
-        profile = self.profiles[customer_id]
-        if tag not in profile.tags:
-            profile.tags.append(tag)
-        profile.updated_at = datetime.now().isoformat()
-        return True
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return False
+
+            if tag not in profile.tags:
+                profile.tags.append(tag)
+            profile.updated_at = datetime.now().isoformat()
+            self._save(profile)
+            return True
 
     def get_profile_summary(self, customer_id: str) -> str:
-        """Get human-readable enterprise client profile summary"""
-        if customer_id not in self.profiles:
-            return "No profile found"
-
-        profile = self.profiles[customer_id]
-        
-        # Build comprehensive summary
-        summary = f"""
+        """Get human-readable enterprise client profile summary (cached until the profile changes)"""
+        summary = self._summary_cache.get(customer_id)
+        if summary is not None:
+            return summary
+
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return "No profile found"
+
+            summary = self._render_summary(profile)
+            self._summary_cache[customer_id] = summary
+            return summary
+
+    @staticmethod
+    def _render_summary(profile: CustomerProfile) -> str:
+        """Render the profile summary; sections are collected and joined once"""
+        parts = [f"""
 ================================================================================
                     ENTERPRISE CLIENT PROFILE
 ================================================================================
@@ -371,58 +516,58 @@ SERVICE INTERESTS
 
 KEY REQUIREMENTS
 ----------------
-"""
+"""]
         if profile.key_requirements:
             for req in profile.key_requirements:
-                summary += f"  * {req}\n"
+                parts.append(f"  * {req}\n")
         else:
-            summary += "No specific requirements captured yet\n"
+            parts.append("No specific requirements captured yet\n")
 
-        summary += """
+        parts.append("""
 SCHEDULED MEETINGS
 ------------------
-"""
+""")
         if profile.scheduled_meetings:
             for meeting in profile.scheduled_meetings:
-                summary += f"  * {meeting['date']} at {meeting['time']} - {meeting['purpose']} [{meeting['status']}]\n"
+                parts.append(f"  * {meeting['date']} at {meeting['time']} - {meeting['purpose']} [{meeting['status']}]\n")
         else:
-            summary += "No meetings scheduled\n"
+            parts.append("No meetings scheduled\n")
 
-        summary += """
+        parts.append("""
 PROPOSED PROJECTS
 -----------------
-"""
+""")
         if profile.proposed_projects:
             for project in profile.proposed_projects:
                 value_str = f"${project['estimated_value']:,.2f}" if project.get('estimated_value') else "TBD"
-                summary += f"  * {project['project_name']} ({project['project_type']})\n"
-                summary += f"    Description: {project['description']}\n"
-                summary += f"    Estimated Value: {value_str} | Status: {project['status']}\n"
+                parts.append(f"  * {project['project_name']} ({project['project_type']})\n")
+                parts.append(f"    Description: {project['description']}\n")
+                parts.append(f"    Estimated Value: {value_str} | Status: {project['status']}\n")
         else:
-            summary += "No projects proposed yet\n"
+            parts.append("No projects proposed yet\n")
 
-        summary += """
+        parts.append("""
 COMPLETED PROJECTS
 ------------------
-"""
+""")
         if profile.project_history:
             for project in profile.project_history[-5:]:
                 status_icon = "[DONE]" if project.get('status') == 'completed' else "[IN PROGRESS]"
-                summary += f"  {status_icon} {project['project_name']}: ${project['value']:,.2f}\n"
-                summary += f"          Category: {project['service_category']} | Date: {project['date'][:10]}\n"
+                parts.append(f"  {status_icon} {project['project_name']}: ${project['value']:,.2f}\n")
+                parts.append(f"          Category: {project['service_category']} | Date: {project['date'][:10]}\n")
         else:
-            summary += "No completed projects yet\n"
+            parts.append("No completed projects yet\n")
 
         if profile.issues_reported:
-            summary += """
+            parts.append("""
 SUPPORT REQUESTS
 ----------------
-"""
+""")
             for issue in profile.issues_reported[-3:]:
                 status = "[RESOLVED]" if issue['resolved'] else "[OPEN]"
-                summary += f"  {status} {issue['description']}\n"
+                parts.append(f"  {status} {issue['description']}\n")
 
-        summary += f"""
+        parts.append(f"""
 TAGS
 ----
 {', '.join(profile.tags) if profile.tags else "No tags"}
@@ -432,15 +577,15 @@ LAST INTERACTION
 {profile.last_interaction_summary or "No previous interaction"}
 
 ================================================================================
-"""
-        return summary
+""")
+        return "".join(parts)
 
     def recommend_services(self, customer_id: str) -> List[str]:
         """Generate AI service recommendations based on project history and interests"""
-        if customer_id not in self.profiles:
+        profile = self.repository.get(customer_id)
+        if profile is None:
             return []
 
-        profile = self.profiles[customer_id]
         recommendations = []
 
         # Recommendation logic based on project patterns
@@ -488,17 +633,26 @@ LAST INTERACTION
         return self.recommend_services(customer_id)
 
     def export_profile(self, customer_id: str) -> Dict[str, Any]:
-        """Export profile as dictionary"""
-        if customer_id not in self.profiles:
-            return {}
+        """Export profile as dictionary (cached until the profile changes; treat as read-only)"""
+        exported = self._export_cache.get(customer_id)
+        if exported is not None:
+            return exported
+
+        with self._locks.for_key(customer_id):
+            profile = self.repository.get(customer_id)
+            if profile is None:
+                return {}
 
-        return self.profiles[customer_id].to_dict()
+            exported = profile.to_dict()
+            self._export_cache[customer_id] = exported
+            return exported
 
     def import_profile(self, profile_data: Dict[str, Any]) -> bool:
         """Import profile from dictionary"""
         try:
             profile = CustomerProfile(**profile_data)
-            self.profiles[profile.customer_id] = profile
+            with self._locks.for_key(profile.customer_id):
+                self._save(profile)
             return True
         except Exception as e:
             print(f"Error importing profile: {e}")
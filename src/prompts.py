@@ -0,0 +1,163 @@
+"""
+Prompt registry and precompiled keyword matchers
+
+Prompt templates are parsed once at import time and addressed by versioned
+ids ("<name>@v<n>"). PromptRegistry builds each prompt's chain once per
+agent and rebuilds it only when the underlying model changes. Every chain
+carries its prompt id as run name, tag and metadata, so traces and cache
+statistics can be attributed to an exact prompt version. Bump the version
+whenever a template's wording changes.
+
+The keyword tables used for rule-based profile signals live here too, each
+category compiled into a single regular expression.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Type
+
+from langchain_core.prompts import PromptTemplate
+
+
+RESPONSE_PROMPT_ID = "client_response@v1"
+ANALYSIS_PROMPT_ID = "message_analysis@v2"
+
+
+PROMPTS: Dict[str, PromptTemplate] = {
+    RESPONSE_PROMPT_ID: PromptTemplate(
+        input_variables=["customer_name", "context", "user_message"],
+        template="""You are a professional Enterprise Client Relationship Manager at VANCO AI - a leading AI development company that builds custom AI solutions for enterprises.
+
+ABOUT VANCO AI:
+- Custom AI development from concept to production
+- Services: AI & Machine Learning, Full-Stack Product Engineering, Analytics & Data Engineering, Cloud & DevOps
+- Capabilities: Generative AI (LLMs, VLMs), Computer Vision, NLP & Conversational AI, Predictive Analytics
+- Offerings: Full-Stack AI Product Development, Workforce Augmentation, AI Consulting
+- Trusted by 50+ enterprises including Toyota, Mahindra, Tata, and more
+- Global offices in India, USA, UK, Dubai
+
+Client Information:
+{context}
+
+Client Message: {user_message}
+
+Based on the client's history, project interests, and current message, provide a personalized, professional response.
+Remember to:
+1. Address the client by name ({customer_name})
+2. Reference their past projects, interests, or industry when relevant
+3. Suggest relevant Vanco AI services or solutions if appropriate
+4. Show deep understanding of their enterprise AI needs
+5. Provide actionable next steps or schedule consultation if needed
+6. Maintain a consultative, expert tone befitting enterprise clients
+7. Do NOT include any signature, sign-off with a name, or "[Your Name]" placeholder - just provide the response content directly
+8. Keep the response conversational and helpful without formal letter-style endings
+
+Response:"""
+    ),
+    ANALYSIS_PROMPT_ID: PromptTemplate(
+        input_variables=["message"],
+        template="""Analyze this customer message for an enterprise AI services company.
+Extract any business information it mentions, leaving fields empty when not mentioned,
+and classify the overall sentiment as positive, neutral, or negative.
+
+Customer Message: {message}"""
+    ),
+}
+
+
+class KeywordMatcher:
+    """Substring matcher for a keyword list, compiled into one regular expression"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(keywords)
+        # Longest first so the alternation reports the most specific keyword
+        self._pattern = re.compile(
+            "|".join(re.escape(keyword) for keyword in sorted(self.keywords, key=len, reverse=True))
+        )
+
+    def matches(self, text_lower: str) -> bool:
+        """True when any keyword occurs in the (already lowercased) text"""
+        return self._pattern.search(text_lower) is not None
+
+
+def _compile(table: Dict[str, List[str]]) -> Dict[str, KeywordMatcher]:
+    return {category: KeywordMatcher(keywords) for category, keywords in table.items()}
+
+
+# Service interests for Vanco AI
+SERVICE_KEYWORDS = _compile({
+    "ai_ml": ["ai", "machine learning", "ml", "deep learning", "neural", "model", "llm", "gpt", "generative"],
+    "computer_vision": ["vision", "image", "video", "detection", "recognition", "ocr", "camera"],
+    "nlp": ["nlp", "chatbot", "conversational", "language", "text", "sentiment", "speech"],
+    "data_analytics": ["analytics", "dashboard", "data", "pipeline", "bi", "reporting", "insights"],
+    "cloud_devops": ["cloud", "aws", "azure", "gcp", "devops", "infrastructure", "deployment"],
+    "full_stack": ["web", "mobile", "app", "api", "frontend", "backend", "development", "website"],
+    "consulting": ["consulting", "strategy", "roadmap", "assessment", "audit"],
+    "automation": ["automation", "workflow", "process", "rpa", "automate"],
+})
+
+INDUSTRY_KEYWORDS = _compile({
+    "manufacturing": ["manufacturing", "factory", "production", "supply chain"],
+    "retail": ["retail", "ecommerce", "store", "shopping"],
+    "healthcare": ["healthcare", "medical", "hospital", "pharma"],
+    "finance": ["finance", "banking", "fintech", "insurance"],
+    "media": ["media", "entertainment", "content", "streaming"],
+    "logistics": ["logistics", "shipping", "delivery", "transport"],
+    "education": ["education", "university", "learning", "training"],
+})
+
+URGENCY_KEYWORDS = KeywordMatcher(["urgent", "asap", "immediately", "deadline", "quick", "fast"])
+
+ISSUE_KEYWORDS = KeywordMatcher(
+    ["problem", "issue", "bug", "broken", "not working", "complaint", "disappointed", "delayed", "failed"]
+)
+
+
+class PromptSpec(NamedTuple):
+    """How to turn a registered prompt into a chain"""
+    prompt_id: str
+    cache_kind: Optional[str]
+    schema: Optional[Type[Any]] = None
+
+
+class PromptRegistry:
+    """Builds each prompt's chain once and reuses it until the model changes"""
+
+    def __init__(self, llm_for: Callable[[Optional[str]], Any]):
+        """Initialize the registry
+
+        Args:
+            llm_for: Returns the chat model to use for an LLM cache kind
+        """
+        self.llm_for = llm_for
+        self._specs: Dict[str, PromptSpec] = {}
+        self._chains: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def register(self, prompt_id: str, cache_kind: Optional[str] = None, schema: Optional[Type[Any]] = None) -> None:
+        """Declare a prompt from PROMPTS, its LLM cache kind and optional output schema"""
+        if prompt_id not in PROMPTS:
+            raise KeyError(f"Unknown prompt id: {prompt_id}")
+        self._specs[prompt_id] = PromptSpec(prompt_id, cache_kind, schema)
+        self._chains.pop(prompt_id, None)
+
+    def chain(self, prompt_id: str):
+        """Prompt | model chain for a registered prompt id"""
+        spec = self._specs[prompt_id]
+        llm = self.llm_for(spec.cache_kind)
+        source, chain = self._chains.get(prompt_id, (None, None))
+        if source is llm:
+            return chain
+
+        with self._lock:
+            model = llm.with_structured_output(spec.schema, method="function_calling") if spec.schema else llm
+            chain = (PROMPTS[prompt_id] | model).with_config(
+                run_name=prompt_id,
+                tags=[prompt_id],
+                metadata={"prompt_id": prompt_id}
+            )
+            self._chains[prompt_id] = (llm, chain)
+        return chain
+
+    def prompt_ids(self) -> List[str]:
+        """Versioned ids of the registered prompts"""
+        return list(self._specs)
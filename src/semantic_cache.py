@@ -0,0 +1,172 @@
+"""
+Semantic cache for client responses
+
+Near-duplicate questions ("what services do you offer?" / "which services
+do you provide?") reuse an earlier answer instead of a new LLM call. Each
+entry holds the L2-normalized query embedding, a scope hash and the answer.
+A lookup is one matrix-vector product over a fixed-size ring buffer, masked
+to entries of the same scope that are younger than the TTL; the oldest
+entry is overwritten once the buffer is full.
+
+With per_customer=True (the default) the scope is the customer and a hash
+of the stable profile fields, so an answer is reused for the same client
+until something that personalizes it changes. Retrieved memory ids are left
+out: every turn stores new memories, which would make every scope unique.
+
+per_customer=False shares answers across clients, but only for turns that
+carry no per-client context (no memories and nothing in the profile beyond
+identity and defaults). The client's name is stored as a placeholder and
+filled back in on a hit; answers whose name cannot be scrubbed safely (too
+short, or also used as an ordinary word) are not shared.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """Embedding-similarity response cache with size and age eviction"""
+
+    # Profile fields that change every turn without changing what the answer should say
+    VOLATILE_PROFILE_FIELDS = ("interaction_count", "last_interaction_summary", "updated_at", "created_at")
+    # Fields every turn has; they do not make an answer specific to one client
+    IDENTITY_PROFILE_FIELDS = ("customer_id", "name")
+    PROFILE_DEFAULTS = {"sentiment_trend": "neutral"}
+    NAME_PLACEHOLDER = "\x00customer_name\x00"
+    # Shorter names (or name parts) cannot be scrubbed from shared answers safely
+    MIN_NAME_LENGTH = 3
+
+    def __init__(
+        self,
+        embedder=None,
+        threshold: float = 0.9,
+        max_entries: int = 2048,
+        ttl: float = 3600.0,
+        per_customer: bool = True
+    ):
+        """Initialize the semantic cache
+
+        Args:
+            embedder: Object with `dimension` and `embed(texts)` returning
+                L2-normalized rows; defaults to vector_memory.HashingEmbedder
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Ring buffer size; the oldest entry is evicted first
+            ttl: Seconds before an entry stops matching
+            per_customer: Scope answers to customer and profile version; when
+                False, share answers to context-free turns across clients
+        """
+        if embedder is None:
+            from vector_memory import HashingEmbedder
+            embedder = HashingEmbedder()
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.per_customer = per_customer
+
+        self._vectors = np.zeros((max_entries, embedder.dimension), dtype=np.float32)
+        self._scopes = np.zeros(max_entries, dtype=np.uint64)
+        self._created = np.full(max_entries, -np.inf)
+        self._responses: List[Optional[str]] = [None] * max_entries
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0}
+
+    def profile_version(self, profile: Optional[Dict[str, Any]]) -> str:
+        """Hash of the profile fields that shape a response"""
+        if not profile:
+            return ""
+        stable = {key: value for key, value in profile.items() if key not in self.VOLATILE_PROFILE_FIELDS}
+        return hashlib.blake2b(json.dumps(stable, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+    def is_personalized(self, profile: Optional[Dict[str, Any]], memories: List[Any]) -> bool:
+        """Whether a turn carries per-client context (memories or profile facts)"""
+        if memories:
+            return True
+        skip = self.VOLATILE_PROFILE_FIELDS + self.IDENTITY_PROFILE_FIELDS
+        return any(
+            value and value != self.PROFILE_DEFAULTS.get(key)
+            for key, value in (profile or {}).items() if key not in skip
+        )
+
+    def scope_for(
+        self,
+        customer_id: str,
+        profile: Optional[Dict[str, Any]],
+        memories: List[Any]
+    ) -> Optional[int]:
+        """Scope hash for a turn, or None when its answer must not be cached"""
+        if not self.per_customer:
+            return None if self.is_personalized(profile, memories) else 0
+        key = json.dumps([customer_id, self.profile_version(profile)])
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+    def lookup(self, query: str, scope: int, customer_name: str = "") -> Optional[str]:
+        """Cached answer for a near-duplicate query in the same scope, or None"""
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            similarities = self._vectors @ vector
+            live = (self._scopes == np.uint64(scope)) & (self._created > time.time() - self.ttl)
+            similarities = np.where(live, similarities, -1.0)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                self.metrics["hits"] += 1
+                return self._responses[best].replace(self.NAME_PLACEHOLDER, customer_name)
+            self.metrics["misses"] += 1
+            return None
+
+    def store(self, query: str, scope: int, response: str, customer_name: str = "") -> None:
+        """Remember the answer to a query, overwriting the oldest entry when full"""
+        if not response:
+            return
+        if not self.per_customer and customer_name:
+            response = self.scrub_name(response, customer_name)
+            if response is None:
+                return
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            slot = self._cursor
+            self._vectors[slot] = vector
+            self._scopes[slot] = np.uint64(scope)
+            self._created[slot] = time.time()
+            self._responses[slot] = response
+            self._cursor = (slot + 1) % self.max_entries
+            self.metrics["stores"] += 1
+
+    def scrub_name(self, response: str, customer_name: str) -> Optional[str]:
+        """Replace the client's name (and its parts) with NAME_PLACEHOLDER
+
+        Returns None when the name cannot be removed safely: a part is too
+        short, or it also appears in another case ("Will" vs "will"), so it
+        may be an ordinary word rather than the name.
+        """
+        parts = sorted({customer_name.strip(), *customer_name.split()}, key=len, reverse=True)
+        for part in parts:
+            if len(part) < self.MIN_NAME_LENGTH:
+                return None
+            exact = re.compile(rf"\b{re.escape(part)}\b")
+            if len(exact.findall(response)) != len(re.findall(rf"\b{re.escape(part)}\b", response, re.IGNORECASE)):
+                return None
+            response = exact.sub(self.NAME_PLACEHOLDER, response)
+        return response
+
+    def clear(self) -> None:
+        """Forget every entry"""
+        with self._lock:
+            self._created[:] = -np.inf
+            self._responses = [None] * self.max_entries
+            self._cursor = 0
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit/miss/store counters and the number of live entries"""
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["entries"] = int(np.count_nonzero(self._created > time.time() - self.ttl))
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        return metrics
@@ -0,0 +1,165 @@
+"""
+Tiered sentiment classification
+
+Tier 1 is the lexicon scorer in utils.SentimentAnalyzer (tokenized, with
+negation handling). Tier 2 is an optional logistic regression over hashed
+word unigrams and bigrams, loaded from a .npz weights file. The combined
+message analysis call already returns the LLM's label, so that label is
+used whenever the call succeeds; the local tiers settle the sentiment when
+the call fails or is skipped, and neutral is used when neither is confident.
+"""
+import threading
+import zlib
+from typing import Dict, Optional, Sequence, Tuple
+
+from utils import SentimentAnalyzer
+
+
+class HashedNgramSentimentModel:
+    """Multinomial logistic regression over hashed unigram and bigram counts"""
+
+    LABELS = ("negative", "neutral", "positive")
+
+    def __init__(self, n_features: int = 2 ** 16, weights=None, bias=None):
+        """Initialize the model (NumPy is imported lazily)
+
+        Args:
+            n_features: Hash space size for n-gram features
+            weights: Optional (len(LABELS), n_features) weight matrix
+            bias: Optional (len(LABELS),) bias vector
+        """
+        import numpy as np
+
+        self._np = np
+        self.n_features = n_features
+        self.weights = (
+            np.asarray(weights, dtype=np.float32) if weights is not None
+            else np.zeros((len(self.LABELS), n_features), dtype=np.float32)
+        )
+        self.bias = (
+            np.asarray(bias, dtype=np.float32) if bias is not None
+            else np.zeros(len(self.LABELS), dtype=np.float32)
+        )
+
+    def features(self, text: str):
+        """Hashed feature indices and counts for unigrams and bigrams"""
+        np = self._np
+        tokens = SentimentAnalyzer.tokenize(text)
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not grams:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        hashed = np.fromiter(
+            (zlib.crc32(gram.encode()) % self.n_features for gram in grams),
+            dtype=np.int64, count=len(grams)
+        )
+        indices, counts = np.unique(hashed, return_counts=True)
+        return indices, counts.astype(np.float32)
+
+    def _softmax(self, logits):
+        np = self._np
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Class probabilities for one text"""
+        indices, counts = self.features(text)
+        logits = self.weights[:, indices] @ counts + self.bias
+        return dict(zip(self.LABELS, self._softmax(logits).tolist()))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label and its probability"""
+        probabilities = self.predict_proba(text)
+        label = max(probabilities, key=probabilities.get)
+        return label, probabilities[label]
+
+    def fit(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        epochs: int = 10,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        batch_size: int = 64,
+        seed: int = 0
+    ) -> "HashedNgramSentimentModel":
+        """Train with mini-batch gradient descent on cross-entropy loss"""
+        np = self._np
+        rng = np.random.default_rng(seed)
+        samples = [self.features(text) for text in texts]
+        targets = np.array([self.LABELS.index(label) for label in labels])
+
+        for _ in range(epochs):
+            order = rng.permutation(len(samples))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                grad_weights = l2 * self.weights
+                grad_bias = np.zeros_like(self.bias)
+                for row in batch:
+                    indices, counts = samples[row]
+                    probabilities = self._softmax(self.weights[:, indices] @ counts + self.bias)
+                    probabilities[targets[row]] -= 1.0
+                    grad_weights[:, indices] += np.outer(probabilities, counts) / len(batch)
+                    grad_bias += probabilities / len(batch)
+                self.weights -= learning_rate * grad_weights
+                self.bias -= learning_rate * grad_bias
+        return self
+
+    def save(self, path: str) -> None:
+        """Write weights to a .npz file"""
+        self._np.savez_compressed(path, weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramSentimentModel":
+        """Load weights written by save()"""
+        import numpy as np
+
+        with np.load(path) as data:
+            return cls(n_features=data["weights"].shape[1], weights=data["weights"], bias=data["bias"])
+
+
+class SentimentEngine:
+    """LLM label with a lexicon -> local model fallback cascade"""
+
+    def __init__(self, model_path: Optional[str] = None, confidence_threshold: float = 0.6):
+        """Initialize the engine
+
+        Args:
+            model_path: Optional .npz weights for HashedNgramSentimentModel
+            confidence_threshold: Minimum confidence for a local tier to decide
+        """
+        self.confidence_threshold = confidence_threshold
+        self.model = None
+        if model_path:
+            try:
+                self.model = HashedNgramSentimentModel.load(model_path)
+            except Exception as e:
+                print(f"Error loading sentiment model: {e}")
+        self._lock = threading.Lock()
+        self.metrics = {"lexicon": 0, "model": 0, "llm": 0, "default": 0}
+
+    def classify(self, text: str) -> Tuple[Optional[str], str]:
+        """Return (label, tier), or (None, "llm") when the LLM should decide
+
+        Only a tier that produced a label is counted; for (None, "llm") the
+        caller records whichever tier finally settles the message.
+        """
+        label, confidence = SentimentAnalyzer.score(text)
+        tier = "lexicon"
+        if confidence < self.confidence_threshold and self.model is not None:
+            label, confidence = self.model.predict(text)
+            tier = "model"
+        if confidence < self.confidence_threshold:
+            return None, "llm"
+        self.record(tier)
+        return label, tier
+
+    def record(self, tier: str) -> None:
+        """Count a message settled outside classify() ("llm" or "default")"""
+        with self._lock:
+            self.metrics[tier] += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        """How many messages each tier decided"""
+        with self._lock:
+            return dict(self.metrics)
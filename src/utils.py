@@ -3,7 +3,10 @@ Utility functions for Customer Relationship AI Agent
 """
 import json
 import re
-from typing import List, Dict, Any, Optional
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+from typing import List, Dict, Any, Iterator, Optional
 from datetime import datetime
 import hashlib
 
@@ -54,29 +57,74 @@ class TextProcessor:
 class SentimentAnalyzer:
     """Sentiment analysis utilities"""
 
-    POSITIVE_WORDS = {
+    POSITIVE_WORDS = frozenset({
         "great", "excellent", "amazing", "wonderful", "fantastic", "love",
-        "happy", "satisfied", "good", "perfect", "awesome", "best", "thanks"
-    }
+        "happy", "satisfied", "good", "perfect", "awesome", "best", "thanks",
+        "thank", "glad", "pleased", "impressed", "helpful", "appreciate",
+        "excited", "smooth", "reliable", "delighted"
+    })
 
-    NEGATIVE_WORDS = {
+    NEGATIVE_WORDS = frozenset({
         "bad", "terrible", "awful", "horrible", "worst", "hate", "angry",
-        "disappointed", "poor", "problem", "issue", "complaint", "sad"
-    }
+        "disappointed", "poor", "problem", "issue", "complaint", "sad",
+        "frustrated", "frustrating", "unhappy", "broken", "slow", "delay",
+        "delayed", "fail", "failed", "failing", "bug", "unacceptable", "annoyed",
+        "useless", "refund", "outage", "crash"
+    })
+
+    NEGATIONS = frozenset({
+        "not", "no", "never", "without", "hardly", "barely", "nothing", "neither", "nor",
+        "dont", "don't", "doesnt", "doesn't", "didnt", "didn't", "isnt", "isn't",
+        "wasnt", "wasn't", "arent", "aren't", "cant", "can't", "cannot", "wont", "won't"
+    })
+
+    # How many following tokens a negation flips
+    NEGATION_SCOPE = 3
+
+    # Confidence reported when no sentiment-bearing word is present; kept below
+    # the engine's 0.6 threshold so messages without evidence are not settled here
+    NEUTRAL_CONFIDENCE = 0.4
+
+    _TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
 
     @classmethod
-    def simple_sentiment(cls, text: str) -> str:
-        """Simple sentiment analysis based on keyword matching"""
-        text_lower = text.lower()
+    def tokenize(cls, text: str) -> List[str]:
+        """Lowercase word tokens, keeping contractions such as don't"""
+        return cls._TOKEN_PATTERN.findall(text.lower())
 
-        positive_count = sum(1 for word in cls.POSITIVE_WORDS if word in text_lower)
-        negative_count = sum(1 for word in cls.NEGATIVE_WORDS if word in text_lower)
+    @classmethod
+    def score(cls, text: str) -> tuple[str, float]:
+        """Lexicon sentiment with negation handling, returned with a 0-1 confidence"""
+        positive = negative = 0
+        negated_until = -1
+        for position, token in enumerate(cls.tokenize(text)):
+            if token in cls.NEGATIONS:
+                negated_until = position + cls.NEGATION_SCOPE
+                continue
+            polarity = (token in cls.POSITIVE_WORDS) - (token in cls.NEGATIVE_WORDS)
+            if not polarity:
+                continue
+            if position <= negated_until:
+                polarity = -polarity
+            if polarity > 0:
+                positive += 1
+            else:
+                negative += 1
+
+        total = positive + negative
+        if total == 0:
+            return "neutral", cls.NEUTRAL_CONFIDENCE
+        margin = abs(positive - negative)
+        if margin == 0:
+            return "neutral", 0.3
+        label = "positive" if positive > negative else "negative"
+        # One-sided evidence is trusted more; mixed signals fall toward 0.5
+        return label, 0.5 + 0.5 * (margin / total) * min(1.0, margin / 2)
 
-        if positive_count > negative_count:
-            return "positive"
-        elif negative_count > positive_count:
-            return "negative"
-        return "neutral"
+    @classmethod
+    def simple_sentiment(cls, text: str) -> str:
+        """Simple sentiment analysis based on keyword matching"""
+        return cls.score(text)[0]
 
 
 class DataValidator:
@@ -231,3 +279,30 @@ class Logger:
     @staticmethod
     def debug(message: str, component: str = "Agent"):
         Logger.log("DEBUG", message, component)
+
+
+class LockStripes:
+    """Fixed pool of re-entrant locks; a key always maps to the same stripe
+
+    Work on one customer is serialized while different customers (almost
+    always on different stripes) proceed in parallel, with memory bounded
+    by the stripe count rather than the number of customers.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def for_key(self, key: str) -> threading.RLock:
+        """Lock guarding key"""
+        return self._locks[zlib.crc32(key.encode()) % len(self._locks)]
+
+    @contextmanager
+    def all(self) -> Iterator[None]:
+        """Hold every stripe, for operations spanning all keys
+
+        Stripes are taken in a fixed order; callers must not already hold one.
+        """
+        with ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            yield
@@ -0,0 +1,416 @@
+"""
+Local vector memory backend with embeddings and approximate nearest-neighbour search
+
+Drop-in alternative to SupermemoryManager/LocalMemoryManager for when
+Supermemory.ai is unreachable. Memories are embedded by a pluggable local
+embedder and kept per customer in float32 matrices. Small collections are
+searched exactly with vectorized cosine similarity; past ann_threshold rows an
+IVF (inverted file) index restricts the search to the closest clusters.
+
+An embedder is any object with a `dimension` attribute and an
+`embed(texts: List[str]) -> np.ndarray` method returning L2-normalized rows.
+"""
+import asyncio
+import re
+import threading
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from utils import LockStripes
+
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder (unigrams + bigrams)
+
+    No model download and identical vectors across processes, which makes it
+    suitable for tests and offline deployments. Similarity is lexical rather
+    than truly semantic.
+    """
+
+    def __init__(self, dimension: int = 512):
+        """Initialize hashing embedder"""
+        self.dimension = dimension
+
+    def _features(self, text: str) -> List[str]:
+        """Unigram and bigram features for a text"""
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2-normalized float32 rows"""
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode())
+                # Low bits pick the bucket, one high bit picks the sign
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dimension] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (optional dependency)"""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        """Load a sentence-transformers model"""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "SentenceTransformerEmbedder requires `pip install sentence-transformers`"
+            ) from e
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2-normalized float32 rows"""
+        return self.model.encode(texts, normalize_embeddings=True).astype(np.float32)
+
+
+class _IVFIndex:
+    """Inverted-file ANN index: spherical k-means centroids plus per-cluster row lists"""
+
+    def __init__(self, vectors: np.ndarray, rows: np.ndarray, seed: int = 0):
+        """Train centroids on the given rows and assign every row to a cluster"""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, int(np.sqrt(len(rows))))
+        sample = rows if len(rows) <= 64 * nlist else rng.choice(rows, 64 * nlist, replace=False)
+        data = vectors[sample]
+
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(10):
+            assignment = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self.lists: List[List[int]] = [[] for _ in range(nlist)]
+        for row, cluster in zip(rows.tolist(), np.argmax(vectors[rows] @ self.centroids.T, axis=1).tolist()):
+            self.lists[cluster].append(row)
+        self.built_size = len(rows)
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        """Assign a new row to its nearest cluster"""
+        self.lists[int(np.argmax(self.centroids @ vector))].append(row)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows in the nprobe clusters closest to the query"""
+        scores = self.centroids @ query
+        nprobe = min(nprobe, len(scores))
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        lists = [self.lists[cluster] for cluster in probe if self.lists[cluster]]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        # unique() also drops the stale duplicate an update leaves behind
+        return np.unique(np.concatenate([np.asarray(rows, dtype=np.int64) for rows in lists]))
+
+
+class _CustomerVectors:
+    """One customer's embedding matrix with aligned memory entries"""
+
+    def __init__(self, dimension: int):
+        self.vectors = np.zeros((64, dimension), dtype=np.float32)
+        self.alive = np.zeros(64, dtype=bool)
+        self.type_codes = np.zeros(64, dtype=np.int32)
+        self.entries: List[Optional[Dict[str, Any]]] = []
+        self.row_of: Dict[int, int] = {}
+        self.next_id = 0
+        self.ivf: Optional[_IVFIndex] = None
+
+    @property
+    def size(self) -> int:
+        """Rows in use, including deleted ones awaiting compaction"""
+        return len(self.entries)
+
+    def reserve(self, extra: int) -> None:
+        """Grow the backing arrays geometrically"""
+        needed = self.size + extra
+        if needed <= len(self.vectors):
+            return
+        capacity = max(needed, 2 * len(self.vectors))
+        for name in ("vectors", "alive", "type_codes"):
+            old = getattr(self, name)
+            grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+
+class VectorMemoryManager:
+    """Local vector memory manager with embeddings and ANN search"""
+
+    def __init__(
+        self,
+        embedder=None,
+        ann_threshold: int = 20000,
+        nprobe: int = 8
+    ):
+        """Initialize vector memory storage"""
+        self.embedder = embedder or HashingEmbedder()
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.collections: Dict[str, _CustomerVectors] = {}
+        self._type_codes: Dict[str, int] = {}
+        # Per-customer stripes guard each collection's rows; embedding runs outside them
+        self._locks = LockStripes()
+        self._type_lock = threading.Lock()
+
+    def _type_code(self, memory_type: str) -> int:
+        """Stable integer code for a memory type"""
+        with self._type_lock:
+            return self._type_codes.setdefault(memory_type, len(self._type_codes))
+
+    def create_memory_namespace(self, customer_id: str) -> bool:
+        """Create a namespace"""
+        with self._locks.for_key(customer_id):
+            if customer_id not in self.collections:
+                self.collections[customer_id] = _CustomerVectors(self.embedder.dimension)
+        return True
+
+    def invalidate_namespace(self, customer_id: Optional[str] = None) -> None:
+        """Local namespaces are plain dict keys, nothing is cached"""
+        return None
+
+    def warm_namespace_cache(self, page_size: int = 1000) -> int:
+        """Local namespaces are always known"""
+        return len(self.collections)
+
+    def store_memory(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Embed and store a memory"""
+        return self.store_memories(
+            customer_id, [{"content": content, "memory_type": memory_type, "metadata": metadata}]
+        )
+
+    def store_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Embed several memories in one embedder call and store them"""
+        if not items:
+            return True
+        embeddings = self.embedder.embed([item["content"] for item in items])
+        type_codes = [self._type_code(item["memory_type"]) for item in items]
+
+        # Reserve, append and row assignment must not interleave with another writer
+        with self._locks.for_key(customer_id):
+            self.create_memory_namespace(customer_id)
+            collection = self.collections[customer_id]
+            collection.reserve(len(items))
+            for item, vector, type_code in zip(items, embeddings, type_codes):
+                row = collection.size
+                memory_id = collection.next_id
+                collection.next_id += 1
+                collection.entries.append({
+                    "id": memory_id,
+                    "content": item["content"],
+                    "type": item["memory_type"],
+                    "metadata": {
+                        **(item.get("metadata") or {}),
+                        "timestamp": datetime.now().isoformat()
+                    }
+                })
+                collection.vectors[row] = vector
+                collection.alive[row] = True
+                collection.type_codes[row] = type_code
+                collection.row_of[memory_id] = row
+                if collection.ivf is not None:
+                    collection.ivf.add(row, vector)
+
+            self._maybe_rebuild_index(collection)
+        return True
+
+    def _maybe_rebuild_index(self, collection: _CustomerVectors) -> None:
+        """Build the IVF index past the threshold and rebuild it as the collection doubles"""
+        alive_count = len(collection.row_of)
+        if alive_count < self.ann_threshold:
+            collection.ivf = None
+            return
+        if collection.ivf is None or alive_count >= 2 * collection.ivf.built_size:
+            rows = np.flatnonzero(collection.alive[:collection.size])
+            collection.ivf = _IVFIndex(collection.vectors, rows)
+
+    def retrieve_memories(
+        self,
+        customer_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Retrieve the memories most similar to the query (cosine)"""
+        if customer_id not in self.collections or limit <= 0:
+            return []
+        query_vector = self.embedder.embed([query])[0]
+        with self._locks.for_key(customer_id):
+            return self._search(self.collections[customer_id], query_vector, limit, memory_type)
+
+    def _search(
+        self,
+        collection: _CustomerVectors,
+        query_vector: np.ndarray,
+        limit: int,
+        memory_type: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Top rows of one collection for a query vector (caller holds the customer's stripe)"""
+        if not collection.row_of:
+            return []
+        if collection.ivf is not None:
+            rows = collection.ivf.candidates(query_vector, self.nprobe)
+        else:
+            rows = np.arange(collection.size)
+
+        mask = collection.alive[rows]
+        if memory_type:
+            if memory_type not in self._type_codes:
+                return []
+            mask &= collection.type_codes[rows] == self._type_codes[memory_type]
+        rows = rows[mask]
+        if not len(rows):
+            return []
+
+        scores = collection.vectors[rows] @ query_vector
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            {**collection.entries[rows[i]], "score": float(scores[i])}
+            for i in top
+        ]
+
+    def get_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the most recent memories"""
+        with self._locks.for_key(customer_id):
+            collection = self.collections.get(customer_id)
+            if collection is None:
+                return []
+            recent = []
+            for entry in reversed(collection.entries):
+                if len(recent) >= limit:
+                    break
+                if entry is not None:
+                    recent.append(entry)
+            return recent[::-1]
+
+    def delete_memory(self, customer_id: str, memory_id: str) -> bool:
+        """Delete memory"""
+        with self._locks.for_key(customer_id):
+            collection = self.collections.get(customer_id)
+            if collection is None:
+                return False
+            row = collection.row_of.pop(int(memory_id), None)
+            if row is not None:
+                collection.alive[row] = False
+                collection.entries[row] = None
+                if len(collection.row_of) * 2 < collection.size:
+                    self._compact(collection)
+        return True
+
+    def _compact(self, collection: _CustomerVectors) -> None:
+        """Drop deleted rows once they make up half the matrix"""
+        rows = np.flatnonzero(collection.alive[:collection.size])
+        collection.vectors[:len(rows)] = collection.vectors[rows]
+        collection.type_codes[:len(rows)] = collection.type_codes[rows]
+        collection.alive[:] = False
+        collection.alive[:len(rows)] = True
+        collection.entries = [collection.entries[row] for row in rows]
+        collection.row_of = {entry["id"]: row for row, entry in enumerate(collection.entries)}
+        collection.ivf = None
+        self._maybe_rebuild_index(collection)
+
+    def update_memory(
+        self,
+        customer_id: str,
+        memory_id: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Update memory and re-embed its content"""
+        if customer_id not in self.collections:
+            return False
+        vector = self.embedder.embed([content])[0]
+        with self._locks.for_key(customer_id):
+            collection = self.collections[customer_id]
+            # Looked up under the stripe: compaction may have moved the row
+            row = collection.row_of.get(int(memory_id))
+            if row is None:
+                return False
+
+            memory = collection.entries[row]
+            memory["content"] = content
+            if metadata:
+                memory["metadata"].update(metadata)
+            collection.vectors[row] = vector
+            if collection.ivf is not None:
+                # The old cluster keeps a stale entry; candidates are rescored exactly
+                collection.ivf.add(row, vector)
+        return True
+
+    def close(self) -> None:
+        """Nothing to release for local storage"""
+        return None
+
+    # Async API - embedding and search are CPU-bound, so run them off the event loop
+
+    async def acreate_memory_namespace(self, customer_id: str) -> bool:
+        """Async variant of create_memory_namespace"""
+        return self.create_memory_namespace(customer_id)
+
+    async def astore_memory(
+        self,
+        customer_id: str,
+        content: str,
+        memory_type: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of store_memory"""
+        return await asyncio.to_thread(self.store_memory, customer_id, content, memory_type, metadata)
+
+    async def astore_memories(self, customer_id: str, items: List[Dict[str, Any]]) -> bool:
+        """Async variant of store_memories"""
+        return await asyncio.to_thread(self.store_memories, customer_id, items)
+
+    async def aretrieve_memories(
+        self,
+        customer_id: str,
+        query: str,
+        limit: int = 5,
+        memory_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of retrieve_memories"""
+        return await asyncio.to_thread(self.retrieve_memories, customer_id, query, limit, memory_type)
+
+    async def aget_all_memories(self, customer_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Async variant of get_all_memories"""
+        return self.get_all_memories(customer_id, limit)
+
+    async def adelete_memory(self, customer_id: str, memory_id: str) -> bool:
+        """Async variant of delete_memory"""
+        return self.delete_memory(customer_id, memory_id)
+
+    async def aupdate_memory(
+        self,
+        customer_id: str,
+        memory_id: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Async variant of update_memory"""
+        return await asyncio.to_thread(self.update_memory, customer_id, memory_id, content, metadata)
+
+    async def aclose(self) -> None:
+        """Nothing to release for local storage"""
+        return None
@@ -0,0 +1,79 @@
+"""
+Stress check: concurrent profile and memory updates lose nothing
+
+Many threads hammer ProfileBuilder and LocalMemoryManager with
+read-modify-write operations, first all on one customer (fully contended)
+and then spread over many customers (striped). Final counters must equal
+the number of operations issued. Throughput for both runs is printed.
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from memory import LocalMemoryManager
+from profiles import ProfileBuilder
+
+
+THREADS = 16
+OPS_PER_THREAD = 500
+
+
+def run(customers, storage_dir=None):
+    """Issue THREADS * OPS_PER_THREAD updates round-robin over customers and verify them"""
+    builder = ProfileBuilder()
+    memory = LocalMemoryManager(storage_dir=storage_dir, compact_threshold=200)
+    for customer_id in customers:
+        builder.get_or_create_profile(customer_id, customer_id)
+
+    def worker(thread_id):
+        for op in range(OPS_PER_THREAD):
+            customer_id = customers[(thread_id + op) % len(customers)]
+            builder.update_last_interaction(customer_id, f"op {thread_id}/{op}")
+            builder.add_tag(customer_id, f"t{thread_id}-{op}")
+            builder.update_preferences(customer_id, [f"p{thread_id}-{op}"])
+            memory.store_memory(customer_id, f"note {thread_id} {op}", "customer_query")
+            if op % 10 == 0:
+                memory.update_memory(customer_id, "0", f"rewritten by {thread_id}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(worker, range(THREADS)))
+    elapsed = time.perf_counter() - started
+
+    total = THREADS * OPS_PER_THREAD
+    profiles = [builder.export_profile(customer_id) for customer_id in customers]
+    assert sum(p["interaction_count"] for p in profiles) == total, "lost interaction_count updates"
+    assert sum(len(p["tags"]) for p in profiles) == total, "lost tag appends"
+    assert sum(len(p["preferences"]) for p in profiles) == total, "lost preference updates"
+    memories = [memory.get_all_memories(customer_id, limit=total) for customer_id in customers]
+    assert sum(len(m) for m in memories) == total, "lost memory writes"
+    for stored in memories:
+        ids = [entry["id"] for entry in stored]
+        assert len(ids) == len(set(ids)), "duplicate memory ids"
+
+    # Round-trip one profile through export/import into a fresh builder
+    restored = ProfileBuilder()
+    assert restored.import_profile(profiles[0]), "import_profile failed"
+    assert restored.export_profile(customers[0]) == profiles[0], "import_profile lost data"
+    memory.close()
+    return total / elapsed
+
+
+def main():
+    """Run the contended and striped scenarios, in memory and durable"""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        for label, customers, directory in (
+            ("1 customer, in-memory", ["c0"], None),
+            ("256 customers, in-memory", [f"c{i}" for i in range(256)], None),
+            ("256 customers, durable", [f"c{i}" for i in range(256)], storage_dir),
+        ):
+            rate = run(customers, directory)
+            print(f"{label:>26}: OK, {rate:,.0f} updates/s")
+
+
+if __name__ == "__main__":
+    main()